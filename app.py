@@ -1,28 +1,47 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, url_for
 import xml.etree.ElementTree as ET
+import datetime
+import gzip
+import hashlib
+import json
 import os
+import threading
+import time
 import pandas as pd
 
+from jobstore import JOURNAL_FILE, filter_jobs, iter_xml_jobs, merge_journal
+from search import FACETS, FacetIndex, SearchIndex, bitmap, bitmap_ids
+
+try:
+    import brotli  # Optional, better compression for the API when installed
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 
 # Path to XML file
 XML_FILE = "jobs.xml"
+# Seconds between two checks of the background refresh thread (0 = check the files on
+# each request instead).
+REFRESH_INTERVAL = float(os.getenv("JOBS_REFRESH_INTERVAL", "0"))
+# Jobs per page of the table (`per_page` query parameter, capped to MAX_PER_PAGE)
+PER_PAGE = 50
+MAX_PER_PAGE = 500
+# Smaller API responses are not worth compressing
+MIN_COMPRESS_SIZE = 500
 
 
-def load_jobs_from_xml():
-    """Reads job entries from the XML file and returns a list of dictionaries."""
-    jobs = []
+def load_jobs_from_xml(source=None, since=None):
+    """Streams job entries from the XML file (with the journaled new and updated jobs
+    applied) and returns a list of dictionaries, optionally only those of `source` or
+    published since the date `since`."""
     if not os.path.exists(XML_FILE):
-        print("⚠️ XML file not found.")
-        return []
+        # Fresh install: the jobs are still all in the journal
+        print("⚠️ XML file not found, reading the journal only.")
 
     try:
-        tree = ET.parse(XML_FILE)
-        root = tree.getroot()
-
-        for entry in root.findall("entry"):
-            job = {child.tag: child.text if child.text else "N/A" for child in entry}
-            jobs.append(job)
+        jobs = iter_xml_jobs(XML_FILE)
+        jobs = list(filter_jobs(merge_journal(jobs, JOURNAL_FILE), source, since))
 
         print(f"✅ Loaded {len(jobs)} jobs from XML")
         return jobs
@@ -32,39 +51,231 @@ def load_jobs_from_xml():
         return []
 
 
-@app.route("/")
-def index():
-    """Renders the job listings table with filtering and sorting."""
-    jobs = load_jobs_from_xml()
+def _stamp(path):
+    """Returns (mtime, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
-    # Get filter and sort parameters from the request
-    search_query = request.args.get("search", "").strip().lower()
-    sort_by = request.args.get("sort", "publication_date")
-    order = request.args.get("order", "desc")
 
-    # Apply filtering
-    if search_query:
-        jobs = [job for job in jobs if search_query in job["program_title"].lower()]
+class JobCache:
+    """Process-level cache of the jobs, ready to be filtered and sorted.
+
+    The jobs are parsed once and kept as a DataFrame with "N/A" already blanked out,
+    along with a search index and the facet bitmaps (see `search.py`). The cache is
+    rebuilt only when
+    the mtime or size of the XML file or of the journal changes: either checked on
+    each request (`get`) or, once `start_watcher` is called, by a background thread
+    so that requests never wait for parsing.
+    """
+
+    def __init__(self, xml_file=XML_FILE, journal_file=JOURNAL_FILE):
+        self.files = (xml_file, journal_file)
+        self.stamps = None
+        self.frame = pd.DataFrame()
+        self.index = SearchIndex()
+        self.facets = FacetIndex()
+        self.lock = threading.Lock()  # Held while reloading
+        self.swap_lock = threading.Lock()  # Held while updating the index or searching
+        self.watching = False
+
+    def refresh(self):
+        """Reloads the jobs if the files changed since the last load."""
+        stamps = tuple(_stamp(path) for path in self.files)
+        if stamps == self.stamps:
+            return
+        with self.lock:
+            if stamps == self.stamps:  # Reloaded by another thread meanwhile
+                return
+            jobs = load_jobs_from_xml()
+            frame = pd.DataFrame(jobs).replace("N/A", "")
+            facets = FacetIndex(jobs)
+            # Readers see either the old or the new jobs, with the matching index
+            with self.swap_lock:
+                # Only the jobs added or changed since the last load are re-indexed
+                self.index.update(jobs)
+                self.frame, self.facets, self.stamps = frame, facets, stamps
+
+    def get(self, query=""):
+        """Returns (frame, row positions matching `query` best first, facet index) of
+        the current jobs. The positions are None for an empty query."""
+        if not self.watching:
+            self.refresh()
+        with self.swap_lock:
+            return self.frame, self.index.search(query), self.facets
+
+    def start_watcher(self, interval):
+        """Refreshes the cache every `interval` seconds in a daemon thread."""
+
+        def watch():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"❌ Error refreshing jobs: {e}")
+                time.sleep(interval)
+
+        self.refresh()
+        self.watching = True
+        threading.Thread(target=watch, name="job-cache", daemon=True).start()
+
+
+job_cache = JobCache()
+if REFRESH_INTERVAL > 0:
+    job_cache.start_watcher(REFRESH_INTERVAL)
+
+
+def parse_iso_date(value):
+    """Parses a YYYY-MM-DD query parameter (the format of date inputs)."""
+    return datetime.date.fromisoformat(value) if value else None
+
 
-    # Convert to DataFrame for easier sorting
-    df = pd.DataFrame(jobs)
+def query_jobs(args):
+    """Returns the cached jobs filtered and sorted by the query parameters, as a
+    DataFrame, along with the parameters used."""
+    # Get filter and sort parameters from the request
+    search_query = args.get("search", "").strip().lower()
+    # Search results are ranked by relevance unless another order is asked for
+    sort_by = args.get("sort", "relevance" if search_query else "publication_date")
+    order = args.get("order", "desc")
+
+    filters = {facet: args.get(facet, "") for facet in FACETS}
+    deadline_from = args.get("deadline_from", type=parse_iso_date)
+    deadline_to = args.get("deadline_to", type=parse_iso_date)
 
-    # Handle missing values
-    df.replace("N/A", "", inplace=True)
+    # Apply filtering (all the words of the query, prefixes included)
+    df, matches, facets = job_cache.get(search_query)
+    base = facets.all if matches is None else bitmap(matches)
+    base &= facets.deadline_mask(deadline_from, deadline_to)
+    # Count each facet value under the other filters, then apply them all
+    counts = facets.counts(filters, base)
+    mask = facets.select(filters, base)
+    if matches is not None:
+        selected = set(bitmap_ids(mask))
+        df = df.iloc[[i for i in matches if i in selected]]
+    elif mask != facets.all:
+        df = df.iloc[bitmap_ids(mask)]
 
     # Sort based on user selection
     ascending = order == "asc"
     if sort_by in df.columns:
         df = df.sort_values(by=[sort_by], ascending=ascending, na_position="last")
 
+    return df, {
+        "search_query": search_query,
+        "sort_by": sort_by,
+        "order": order,
+        "filters": filters,
+        "facet_counts": counts,
+        "deadline_from": deadline_from.isoformat() if deadline_from else "",
+        "deadline_to": deadline_to.isoformat() if deadline_to else "",
+    }
+
+
+def paginate(df, args):
+    """Returns the rows of the requested page (DataFrame), with the page number, the
+    page size and the number of pages. Out of range pages are clamped."""
+    per_page = min(max(args.get("per_page", PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    pages = max((len(df) + per_page - 1) // per_page, 1)
+    page = min(max(args.get("page", 1, type=int), 1), pages)
+    start = (page - 1) * per_page
+    return df.iloc[start : start + per_page], page, per_page, pages
+
+
+def page_link(endpoint, page):
+    """URL of `endpoint` with the current query parameters and another page."""
+    return url_for(endpoint, **{**request.args.to_dict(), "page": page})
+
+
+@app.route("/")
+def index():
+    """Renders one page of the job listings table with filtering and sorting."""
+    df, params = query_jobs(request.args)
+    jobs, page, per_page, pages = paginate(df, request.args)
+
     return render_template(
         "index.html",
-        jobs=df.to_dict(orient="records"),
-        search_query=search_query,
-        sort_by=sort_by,
-        order=order,
+        jobs=jobs.to_dict(orient="records"),
+        total=len(df),
+        page=page,
+        pages=pages,
+        first=(page - 1) * per_page + 1,
+        page_url=lambda n: page_link("index", n),
+        rows_url=lambda n: page_link("rows", n),
+        **params,
     )
 
 
+@app.route("/rows")
+def rows():
+    """Renders only the table rows of one page, for lazy loading. The URL of the
+    following page, if any, is sent in the X-Next-Page header."""
+    df, _ = query_jobs(request.args)
+    jobs, page, _, pages = paginate(df, request.args)
+
+    jobs = jobs.to_dict(orient="records")
+    response = app.make_response(render_template("_rows.html", jobs=jobs))
+    response.headers["X-Total-Count"] = str(len(df))
+    if page < pages:
+        response.headers["X-Next-Page"] = page_link("rows", page + 1)
+    return response
+
+
+def compress(response):
+    """Compresses a response body with brotli or gzip, as accepted by the client."""
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(data))
+        response.content_encoding = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.content_encoding = "gzip"
+    return response
+
+
+@app.route("/api/jobs")
+def api_jobs():
+    """Returns one page of the jobs as JSON, with the same filters, sorting and
+    pagination parameters as the table. The ETag changes only when the jobs or the
+    query do, so polling clients get an empty 304 while nothing changed. It is weak:
+    the gzip, brotli and plain bodies are the same JSON, not the same bytes."""
+    if not job_cache.watching:
+        job_cache.refresh()
+    query = sorted(request.args.items(multi=True))
+    etag = hashlib.blake2b(
+        json.dumps([job_cache.stamps, query]).encode(), digest_size=16
+    ).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    df, params = query_jobs(request.args)
+    jobs, page, per_page, pages = paginate(df, request.args)
+    meta = {
+        "total": len(df),
+        "page": page,
+        "per_page": per_page,
+        "pages": pages,
+        "sort": params["sort_by"],
+        "order": params["order"],
+    }
+    # The rows are serialized by pandas (missing values become null)
+    body = json.dumps(meta, ensure_ascii=False)[:-1] + ', "jobs": '
+    body += jobs.to_json(orient="records", force_ascii=False) + "}"
+
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True  # Always revalidate, with If-None-Match
+    return compress(response)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
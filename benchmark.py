@@ -0,0 +1,460 @@
+"""
+Benchmarks for the scraper, run against the HTML snapshots committed in `sources/`.
+
+Usage:
+    python benchmark.py parsers     # parse time and peak memory of each HTML backend
+    python benchmark.py classifier  # keyword classifier vs substring matching, on jobs.xml
+    python benchmark.py stages      # every pipeline stage, checked against the baseline
+    python benchmark.py stages --save-baseline  # record the current numbers as baseline
+
+`stages` exits with status 1 when a stage got slower or uses more memory than its
+baseline (`BASELINE_FILE`, written by --save-baseline on the same machine) by more
+than the tolerance.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import main
+from jobstore import JobStore, append_journal, compact, iter_xml_jobs
+
+# HTML snapshot of each source.
+SNAPSHOTS = {name: source["filename"] for name, source in main.SOURCES.items()}
+PARSER_BACKENDS = ["html.parser", "lxml", "html5lib"]
+BASELINE_FILE = "benchmark_baseline.json"
+# A stage regresses when it is `TOLERANCE` times its baseline and also slower by
+# more than `MIN_REGRESSION_MS` (or bigger by more than `MIN_REGRESSION_KB`), so
+# that the noise of the fastest stages is not reported.
+TOLERANCE = 1.5
+MIN_REGRESSION_MS = 2
+MIN_REGRESSION_KB = 256
+
+
+def measure(func, repeat=3, setup=None):
+    """
+    Runs `func` `repeat` times and returns (best wall time in seconds, peak traced
+    memory in bytes of one extra traced run, result of the last call).
+
+    :param setup: Optional function called before each run (not measured); its
+        result is passed to `func`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    args = () if setup is None else (setup(),)
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def available_backends():
+    """
+    Returns the parser backends that are installed.
+    """
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    backends = []
+    for backend in PARSER_BACKENDS:
+        try:
+            BeautifulSoup("<p></p>", backend)
+            backends.append(backend)
+        except FeatureNotFound:
+            print(f"⚠️ {backend} is not installed, skipped.")
+    return backends
+
+
+def bench_parsers(repeat=3):
+    """
+    Compares every installed backend, with and without the listing strainer,
+    on each snapshot. Returns a list of result rows.
+    """
+    rows = []
+    backends = available_backends()
+    for name, filename in SNAPSHOTS.items():
+        with open(filename, "r", encoding="utf-8") as f:
+            html = f.read()
+        for backend in backends:
+            for strained in (False, True):
+                strainer = main.listing_strainer(name) if strained else None
+                seconds, peak, _ = measure(
+                    lambda: main.make_soup(html, strainer, parser=backend), repeat
+                )
+                rows.append(
+                    {
+                        "source": name,
+                        "backend": backend,
+                        "strainer": "listing" if strained else "full page",
+                        "ms": seconds * 1000,
+                        "peak_kb": peak / 1024,
+                    }
+                )
+    return rows
+
+
+def legacy_extract_main_field(text):
+    """
+    `main.extract_main_field` before the compiled classifier (substring matching),
+    kept as the benchmark baseline.
+    """
+    keywords = [
+        "Economics",
+        "Macroeconomics",
+        "Microeconomics",
+        "Microeconomic theory",
+        "Macroeconomic theory" "Labour",
+        "Industrial Organization",
+        "Entrepreneurship",
+        "Healthcare",
+        "Discrimination",
+        "Finance",
+        "Public Policy",
+        "Local Economic Policy",
+        "Climate",
+    ]
+
+    found = []
+    for keyword in keywords:
+        if keyword.lower() in text.lower():
+            found.append(keyword)
+
+    if found:
+        unique_keywords = list(dict.fromkeys(found))
+        return ", ".join(unique_keywords)
+    else:
+        return None
+
+
+def legacy_extract_program_type(text):
+    """
+    `main.extract_program_type` before the compiled classifier, kept as the
+    benchmark baseline.
+    """
+    text_lower = text.lower()
+    if any(kw in text_lower for kw in ["predoctoral", "pre doc", "pre-doc", "predoc"]):
+        return "PreDoctoral Program"
+    elif any(
+        kw in text_lower
+        for kw in ["postdoc", "post doc", "post-doc", "postdoctoral", "post doctoral"]
+    ):
+        return "Post Doc"
+    elif "phd" in text_lower or "ph.d" in text_lower:
+        return "PhD"
+    elif "research assistant" in text_lower or "ra" in text_lower:
+        return "Research Assistant"
+    else:
+        return "Research Assistant"
+
+
+def legacy_find(table, text):
+    """
+    Substring matching of a whole keyword table ({label: [variants]}), the way the
+    legacy functions do it: one case-insensitive search per variant.
+    """
+    return [
+        label
+        for label, variants in table.items()
+        if any(variant.lower() in text.lower() for variant in variants)
+    ]
+
+
+def bench_classifier(repeat=3, xml_file=main.XML_FILE):
+    """
+    Classifies the title and the fields of every job of `xml_file` with the legacy
+    functions (one call per job and keyword) and with the compiled classifiers (one
+    batch). Returns a list of result rows, with the number of jobs whose result
+    differs.
+
+    The last row shows how both scale with the size of the keyword table: the main
+    fields plus every field name of `xml_file` (several hundred labels).
+    """
+    jobs = list(iter_xml_jobs(xml_file))
+    texts = [f"{job.get('fields', '')} {job.get('program_title', '')}" for job in jobs]
+    titles = [job.get("program_title", "") for job in jobs]
+    large_table = dict(main.MAIN_FIELD_KEYWORDS)
+    for job in jobs:
+        for field in job.get("fields", "").split(","):
+            field = field.strip()
+            if field and field != "N/A":
+                large_table.setdefault(field, [field])
+    large_classifier = main.KeywordClassifier(large_table)
+
+    def compiled_program_types():
+        found = main.PROGRAM_TYPE_CLASSIFIER.find_batch(titles)
+        return [f[0] if f else main.DEFAULT_PROGRAM_TYPE for f in found]
+
+    cases = [
+        (
+            "main field",
+            lambda: [legacy_extract_main_field(t) for t in texts],
+            lambda: [
+                ", ".join(f) or None
+                for f in main.MAIN_FIELD_CLASSIFIER.find_batch(texts)
+            ],
+        ),
+        (
+            "program type",
+            lambda: [legacy_extract_program_type(t) for t in titles],
+            compiled_program_types,
+        ),
+        (
+            f"{len(large_table)} labels",
+            lambda: [legacy_find(large_table, t) for t in texts],
+            lambda: large_classifier.find_batch(texts),
+        ),
+    ]
+    rows = []
+    for name, legacy, compiled in cases:
+        legacy_seconds, _, legacy_result = measure(legacy, repeat)
+        seconds, _, result = measure(compiled, repeat)
+        rows.append(
+            {
+                "classifier": name,
+                "jobs": len(jobs),
+                "legacy_ms": legacy_seconds * 1000,
+                "compiled_ms": seconds * 1000,
+                "speedup": legacy_seconds / seconds if seconds else float("inf"),
+                "changed": sum(a != b for a, b in zip(legacy_result, result)),
+            }
+        )
+    return rows
+
+
+def quiet(func):
+    """
+    Returns `func` with its printed output discarded (the pipeline logs every job).
+    """
+
+    def run(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args)
+
+    return run
+
+
+def bench_stages(repeat=3, xml_file=main.XML_FILE):
+    """
+    Runs each stage of the pipeline on the committed snapshots, each one on the
+    output of the previous ones: the three scrapers (offline), classification,
+    normalization, dedup against the jobs of `xml_file`, persistence (upsert,
+    journal and compaction into a copy of the store) and the rendering of the
+    notification email. Returns a list of result rows.
+    """
+    rows = []
+
+    def stage(name, func, setup=None, jobs=None):
+        seconds, peak, result = measure(quiet(func), repeat, setup)
+        rows.append(
+            {
+                "stage": name,
+                "jobs": len(result) if jobs is None else jobs,
+                "ms": seconds * 1000,
+                "peak_kb": peak / 1024,
+            }
+        )
+        return result
+
+    raw = []
+    for name, scraper in main.SCRAPERS.items():
+        raw += stage(f"scrape_{name}", lambda: list(scraper()))
+    # Both stages fill in or pop keys: each run gets fresh copies
+    classified = stage(
+        "classify",
+        lambda jobs: list(main.classify_jobs(jobs)),
+        lambda: [dict(job) for job in raw],
+    )
+    normalized = stage(
+        "normalize",
+        lambda jobs: list(main.normalize_jobs(jobs)),
+        lambda: [dict(job) for job in classified],
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, "jobs.db")
+        journal_file = os.path.join(tmp_dir, "jobs.journal")
+        quiet(main.open_store)(db_file, xml_file, journal_file).close()
+
+        with JobStore(db_file) as store:
+            changes = stage("dedup", lambda: list(main.dedupe_jobs(normalized, store)))
+
+        def copy_store():
+            work_dir = tempfile.mkdtemp(dir=tmp_dir)
+            shutil.copyfile(db_file, os.path.join(work_dir, "jobs.db"))
+            shutil.copyfile(xml_file, os.path.join(work_dir, "jobs.xml"))
+            return work_dir
+
+        def persist(work_dir):
+            # `main.append_jobs_to_xml` when the journal is due for compaction
+            journal = os.path.join(work_dir, "jobs.journal")
+            with JobStore(os.path.join(work_dir, "jobs.db")) as store:
+                added, updated = store.upsert_jobs(job for _, job in changes)
+                append_journal(
+                    [("new", job) for job in added]
+                    + [("changed", job) for job in updated],
+                    journal,
+                )
+                compact(
+                    store,
+                    os.path.join(work_dir, "jobs.xml"),
+                    journal,
+                    os.path.join(work_dir, "previous_jobs.xml"),
+                )
+            return added + updated
+
+        stage("persist", persist, copy_store)
+
+    def render():
+        template = main.email_environment().get_template("email.html")
+        return template.render(
+            recipient_name="Subscriber",
+            new_jobs=normalized,
+            changed_jobs=[],
+            update_time="2025-01-01 00:00:00",
+            github_repo_url=main.GITHUB_REPO_URL,
+            github_issue_url=main.GITHUB_ISSUE_URL,
+        )
+
+    stage("email render", render, jobs=len(normalized))
+    return rows
+
+
+def load_baseline(baseline_file=BASELINE_FILE):
+    """
+    Returns the saved baseline {stage: {"ms": ..., "peak_kb": ...}}, or {} if none.
+    """
+    try:
+        with open(baseline_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(rows, baseline_file=BASELINE_FILE):
+    """
+    Saves the time and peak memory of each stage as the new baseline.
+    """
+    baseline = {
+        row["stage"]: {"ms": round(row["ms"], 3), "peak_kb": round(row["peak_kb"], 1)}
+        for row in rows
+    }
+    with open(baseline_file, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def check_baseline(rows, baseline, tolerance=TOLERANCE):
+    """
+    Adds the baseline numbers and a status to each stage row ("ok", "SLOWER",
+    "MORE MEMORY" or "no baseline"). Returns the number of regressed stages.
+    """
+    regressions = 0
+    for row in rows:
+        base = baseline.get(row["stage"])
+        if base is None:
+            row.update(base_ms="-", base_kb="-", status="no baseline")
+            continue
+        problems = []
+        if (
+            row["ms"] > base["ms"] * tolerance
+            and row["ms"] - base["ms"] > MIN_REGRESSION_MS
+        ):
+            problems.append("SLOWER")
+        if (
+            row["peak_kb"] > base["peak_kb"] * tolerance
+            and row["peak_kb"] - base["peak_kb"] > MIN_REGRESSION_KB
+        ):
+            problems.append("MORE MEMORY")
+        regressions += bool(problems)
+        row.update(
+            base_ms=float(base["ms"]),
+            base_kb=float(base["peak_kb"]),
+            status=" + ".join(problems) or "ok",
+        )
+    return regressions
+
+
+def print_rows(rows):
+    """
+    Prints result rows as an aligned text table.
+    """
+    if not rows:
+        return
+    headers = list(rows[0])
+    cells = [
+        [f"{row[h]:.1f}" if isinstance(row[h], float) else str(row[h]) for h in headers]
+        for row in rows
+    ]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for c in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(c, widths)))
+
+
+def cli(argv=None):
+    """
+    Entry point of the benchmark script. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measure")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("parsers", help="compare the HTML parser backends")
+    commands.add_parser(
+        "classifier", help="compare the keyword classifier with substring matching"
+    )
+    stages = commands.add_parser(
+        "stages", help="time every pipeline stage, checked against the baseline"
+    )
+    stages.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help=f"save the results as the new baseline ({BASELINE_FILE})",
+    )
+    stages.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="slowdown (or memory growth) factor allowed before failing",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "parsers":
+        print_rows(bench_parsers(args.repeat))
+    elif args.command == "classifier":
+        print_rows(bench_classifier(args.repeat))
+    elif args.command == "stages":
+        rows = bench_stages(args.repeat)
+        if args.save_baseline:
+            print_rows(rows)
+            save_baseline(rows)
+            print(f"💾 Baseline saved to {BASELINE_FILE}")
+            return 0
+        baseline = load_baseline()
+        regressions = check_baseline(rows, baseline, args.tolerance)
+        print_rows(rows)
+        if not baseline:
+            print(f"⚠️ No baseline in {BASELINE_FILE}, run with --save-baseline first.")
+        if regressions:
+            print(
+                f"❌ {regressions} stage(s) regressed against {BASELINE_FILE} "
+                f"(tolerance x{args.tolerance})"
+            )
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,164 @@
+"""
+Atom feeds of the job listings, written as static files by the scraper (`main.py`).
+
+One feed lists every job (`all.atom`), plus one per source (`source-nber.atom`...) and
+one per main field (`field-finance.atom`...). After each run only the feeds concerned
+by that run's new and updated jobs are touched: their entries are put first (an
+updated job replaces its previous entry) and the feed is cut to its latest
+`FEED_MAX_ENTRIES` entries, so the history is never re-read.
+"""
+
+import datetime
+import html
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from jobstore import job_fingerprint
+
+FEED_DIR = "feeds"
+FEED_MAX_ENTRIES = 100
+PROJECT_URL = "https://github.com/RickyJ99/RA-rss"
+ATOM_NS = "http://www.w3.org/2005/Atom"
+ET.register_namespace("", ATOM_NS)
+
+# Fields shown in the entry summary: label -> job key
+SUMMARY_FIELDS = {
+    "Institution": "institution",
+    "University": "university",
+    "Department": "department",
+    "Sponsor": "sponsor",
+    "Program type": "program_type",
+    "Main field": "main_field",
+    "Location": "location",
+    "Deadline": "deadline",
+}
+
+
+def _tag(name):
+    return f"{{{ATOM_NS}}}{name}"
+
+
+def _value(job, key):
+    value = str(job.get(key) or "").strip()
+    return "" if value == "N/A" else value
+
+
+def slugify(value):
+    """
+    Returns a file-name friendly version of a facet value ("Public Policy" ->
+    "public-policy").
+    """
+    return re.sub(r"[^a-z0-9]+", "-", value.casefold()).strip("-")
+
+
+def feed_names(job):
+    """
+    Returns {feed file name: feed title} of the feeds a job belongs to.
+    """
+    feeds = {"all.atom": "RA and pre-doctoral jobs"}
+    source = _value(job, "source")
+    if source:
+        feeds[f"source-{slugify(source)}.atom"] = f"RA and pre-doctoral jobs: {source}"
+    for field in _value(job, "main_field").split(","):
+        field = field.strip()
+        if field:
+            feeds[f"field-{slugify(field)}.atom"] = (
+                f"RA and pre-doctoral jobs in {field}"
+            )
+    return feeds
+
+
+def job_entry(job, updated):
+    """
+    Returns the Atom <entry> element of a job (`updated` is an RFC 3339 timestamp).
+    """
+    entry = ET.Element(_tag("entry"))
+    ET.SubElement(entry, _tag("id")).text = f"urn:ra-rss:job:{job_fingerprint(job)}"
+    title = _value(job, "program_title") or "Untitled position"
+    organization = _value(job, "institution") or _value(job, "university")
+    if organization:
+        title = f"{title} – {organization}"
+    ET.SubElement(entry, _tag("title")).text = title
+    ET.SubElement(entry, _tag("updated")).text = updated
+    link = _value(job, "link")
+    if link:
+        ET.SubElement(entry, _tag("link"), href=link, rel="alternate")
+    for key in ("source", "program_type"):
+        if _value(job, key):
+            ET.SubElement(entry, _tag("category"), term=_value(job, key))
+    rows = "".join(
+        f"<li><b>{label}:</b> {html.escape(_value(job, key))}</li>"
+        for label, key in SUMMARY_FIELDS.items()
+        if _value(job, key)
+    )
+    ET.SubElement(entry, _tag("summary"), type="html").text = f"<ul>{rows}</ul>"
+    return entry
+
+
+def _read_feed(path, name, title):
+    """
+    Returns the root of an existing feed, or a new empty feed.
+    """
+    if os.path.exists(path):
+        try:
+            return ET.parse(path).getroot()
+        except ET.ParseError:
+            print(f"⚠️ {path} is corrupted, starting a new feed.")
+    feed = ET.Element(_tag("feed"))
+    ET.SubElement(feed, _tag("id")).text = f"urn:ra-rss:feed:{name}"
+    ET.SubElement(feed, _tag("title")).text = title
+    ET.SubElement(feed, _tag("updated"))
+    ET.SubElement(feed, _tag("link"), href=PROJECT_URL, rel="alternate")
+    author = ET.SubElement(feed, _tag("author"))
+    ET.SubElement(author, _tag("name")).text = "RA-rss"
+    return feed
+
+
+def update_feed(path, name, title, entries, updated, max_entries=FEED_MAX_ENTRIES):
+    """
+    Puts `entries` at the top of the feed at `path` (created if needed), dropping
+    the previous entries with the same IDs and the oldest ones beyond `max_entries`.
+    """
+    feed = _read_feed(path, name, title)
+    ids = {entry.findtext(_tag("id")) for entry in entries}
+    old_entries = [
+        entry
+        for entry in feed.findall(_tag("entry"))
+        if entry.findtext(_tag("id")) not in ids
+    ]
+    for entry in feed.findall(_tag("entry")):
+        feed.remove(entry)
+    feed.find(_tag("updated")).text = updated
+    feed.extend((entries + old_entries)[:max_entries])
+
+    ET.indent(feed)
+    tmp_file = path + ".tmp"
+    ET.ElementTree(feed).write(tmp_file, encoding="utf-8", xml_declaration=True)
+    os.replace(tmp_file, path)
+
+
+def update_feeds(jobs, feed_dir=FEED_DIR, max_entries=FEED_MAX_ENTRIES, now=None):
+    """
+    Adds the new and updated jobs of a run to the feeds they belong to. Only those
+    feeds are rewritten. Returns the names of the updated feeds.
+
+    :param jobs: The run's new and updated jobs.
+    :param now: Time stamp of the entries (`datetime`, default: now in UTC).
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    updated = now.replace(microsecond=0).isoformat()
+    by_feed = {}
+    for job in jobs:
+        entry = job_entry(job, updated)
+        for name, title in feed_names(job).items():
+            by_feed.setdefault(name, (title, []))[1].append(entry)
+    if not by_feed:
+        return []
+
+    os.makedirs(feed_dir, exist_ok=True)
+    for name, (title, entries) in by_feed.items():
+        path = os.path.join(feed_dir, name)
+        update_feed(path, name, title, entries, updated, max_entries)
+    print(f"📰 Updated {len(by_feed)} feed(s) in {feed_dir}/")
+    return list(by_feed)
@@ -0,0 +1,494 @@
+"""
+Indexed local store of the scraped jobs (SQLite).
+
+The store is the reference for duplicate detection: every job is keyed by a compact
+fingerprint of its identifying fields (`job_fingerprint`), so checking if a job is
+known is a single index lookup, and a separate hash of all its fields
+(`content_hash`) tells whether a known job was updated. The jobs of a run are
+written in one transaction.
+
+`jobs.xml` is a snapshot of the store for the web app (`app.py`). Instead of
+rewriting it on every run, the new and updated jobs are appended to a journal
+(`jobs.journal`, one JSON record per line); `compact` periodically folds the journal
+back into the snapshot and keeps the previous snapshot as `previous_jobs.xml`.
+The first time the store is opened it imports the snapshot and the journal.
+"""
+
+import datetime
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import sqlite3
+import xml.etree.ElementTree as ET
+
+DB_FILE = "jobs.db"
+XML_FILE = "jobs.xml"
+JOURNAL_FILE = "jobs.journal"
+BACKUP_FILE = "previous_jobs.xml"
+
+# Bump when the layout, the job IDs or the content hashes change: the store is then
+# rebuilt from the XML.
+SCHEMA_VERSION = 6
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    legacy_id TEXT,
+    content_hash TEXT NOT NULL,
+    source TEXT,
+    deadline TEXT,
+    publication_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_legacy_id ON jobs (legacy_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_source ON jobs (source);
+CREATE INDEX IF NOT EXISTS idx_jobs_deadline ON jobs (deadline);
+CREATE INDEX IF NOT EXISTS idx_jobs_publication_date ON jobs (publication_date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# Fields identifying a posting, by source. Cosmetic fields (deadline wording, salary,
+# dates...) are left out, so that rewording them updates the job instead of adding one.
+# Predoc and NBER list several projects under one title and link, told apart by the
+# sponsoring researchers and the fields of research. EJM numbers its positions.
+FINGERPRINT_FIELDS = {
+    "Predoc": ("program_title", "link", "sponsor", "fields"),
+    "NBER": ("program_title", "link", "sponsor", "fields"),
+    "ejm": ("position_id",),
+}
+DEFAULT_FINGERPRINT_FIELDS = ("program_title", "institution", "link")
+
+# Identifying fields of the jobs stored before their source's fingerprint fields were
+# scraped (EJM jobs without a position ID). Such a job keeps its old ID, and is found by
+# it until a scraped version takes it over (see `JobStore.upsert_jobs`).
+LEGACY_FINGERPRINT_FIELDS = {"ejm": ("program_title", "department", "university")}
+
+# Fields that only identify a job (its fingerprint already covers them), by source.
+# They are left out of `content_hash`, so that a stored job gaining its ID is not an
+# update.
+ID_FIELDS = {"ejm": ("position_id",)}
+
+# Fields computed by the scraper's keyword classifier (`main.classify_jobs`), by source.
+# They are left out of `content_hash`: editing the keywords is not an update of the
+# posting.
+DERIVED_FIELDS = {"NBER": ("main_field", "program_type")}
+DEFAULT_DERIVED_FIELDS = ("main_field",)
+
+# Format of the publication dates in the XML ("27 Feb 2025").
+DATE_FORMAT = "%d %b %Y"
+
+
+def _normalize_key(value):
+    """
+    Normalizes a field for the fingerprint: HTML entities ("&amp;"), case,
+    whitespace, URL scheme and trailing slash don't matter, and "N/A" counts as empty.
+    """
+    value = " ".join(html.unescape(str(value or "")).split()).casefold()
+    if value == "n/a":
+        return ""
+    value = re.sub(r"^https?://(www\.)?", "", value)
+    return value.rstrip("/")
+
+
+def _fingerprint(source, values):
+    key = "\x1f".join([source.casefold()] + values)
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def job_fingerprint(job):
+    """
+    Returns the ID of a job: a 16-character hash of the source and of its
+    normalized identifying fields (see `FINGERPRINT_FIELDS`, or
+    `LEGACY_FINGERPRINT_FIELDS` for an old job that has none of them).
+    """
+    source = str(job.get("source", "")).strip()
+    fields = FINGERPRINT_FIELDS.get(source, DEFAULT_FINGERPRINT_FIELDS)
+    values = [_normalize_key(job.get(f)) for f in fields]
+    if source in LEGACY_FINGERPRINT_FIELDS and not any(values):
+        return legacy_fingerprint(job)
+    return _fingerprint(source, values)
+
+
+def legacy_fingerprint(job):
+    """
+    Returns the ID the job would have had before its source's fingerprint fields
+    were scraped, or None if the source's IDs never changed.
+    """
+    source = str(job.get("source", "")).strip()
+    fields = LEGACY_FINGERPRINT_FIELDS.get(source)
+    if fields is None:
+        return None
+    return _fingerprint(source, [_normalize_key(job.get(f)) for f in fields])
+
+
+def content_hash(job, derived=False):
+    """
+    Returns a hash of all the (normalized) fields of a job, to detect updates. HTML
+    entities are decoded first, so "&amp;" and "&" are the same content.
+
+    :param derived: Include the fields computed by the classifier (`DERIVED_FIELDS`);
+        by default only the fields scraped from the source count.
+    """
+    source = str(job.get("source", "")).strip()
+    skipped = ID_FIELDS.get(source, ())
+    if not derived:
+        skipped += DERIVED_FIELDS.get(source, DEFAULT_DERIVED_FIELDS)
+    items = sorted(
+        (
+            str(k).strip(),
+            html.unescape(str(v)).strip() if v and str(v).strip() else "N/A",
+        )
+        for k, v in job.items()
+        if str(k).strip() not in skipped
+    )
+    data = json.dumps(items, ensure_ascii=False).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _file_stamp(path):
+    """
+    Returns "mtime:size" of a file ("" if it does not exist), to notice external edits.
+    A store that never read the XML has no stamp at all (None).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def parse_date(value):
+    """
+    Parses a date written as `DATE_FORMAT`. Returns None for "N/A" or other text.
+    """
+    try:
+        return datetime.datetime.strptime(str(value).strip(), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def filter_jobs(jobs, source=None, since=None):
+    """
+    Yields the jobs of `source` (e.g. "NBER") published on or after the
+    `datetime.date` `since` (jobs without a publication date are then skipped).
+    Each filter is ignored when None.
+    """
+    for job in jobs:
+        if source and job.get("source") != source:
+            continue
+        if since:
+            published = parse_date(job.get("publication_date"))
+            if published is None or published < since:
+                continue
+        yield job
+
+
+def iter_xml_jobs(xml_file=XML_FILE, source=None, since=None):
+    """
+    Streams the jobs of a jobs XML file: each <entry> is turned into a dictionary
+    and cleared as soon as it is read, so memory stays flat however long the
+    history is. A missing file yields nothing. `source` and `since` filter the
+    jobs early, see `filter_jobs`.
+    """
+    if not os.path.exists(xml_file):
+        return
+
+    def entries():
+        events = ET.iterparse(xml_file, events=("start", "end"))
+        _, root = next(events)
+        for event, elem in events:
+            if event != "end" or elem.tag != "entry":
+                continue
+            job = {
+                child.tag.strip(): child.text.strip() if child.text else "N/A"
+                for child in elem
+            }
+            # Drop the entry (and the root's reference to it) before yielding.
+            elem.clear()
+            root.clear()
+            yield job
+
+    yield from filter_jobs(entries(), source, since)
+
+
+class JobStore:
+    """
+    SQLite-backed job store with O(1) existence checks by job fingerprint.
+
+    Use it as a context manager:
+
+        with JobStore() as store:
+            if job_fingerprint(job) not in store:
+                store.upsert_jobs([job])
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Older layout or IDs: drop it, `open_store` re-imports the XML.
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS jobs")
+                self.conn.execute("DROP TABLE IF EXISTS meta")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def __contains__(self, key):
+        row = self.conn.execute("SELECT 1 FROM jobs WHERE job_id = ?", (key,))
+        return row.fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        row = row.fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def _find(self, job):
+        """
+        Returns (stored ID, content hash) of the stored version of a job, looked up
+        by its fingerprint and then by its legacy one, or None.
+        """
+        row = self.conn.execute(
+            "SELECT job_id, content_hash FROM jobs WHERE job_id = ?",
+            (job_fingerprint(job),),
+        ).fetchone()
+        legacy = legacy_fingerprint(job)
+        if row is None and legacy is not None:
+            row = self.conn.execute(
+                "SELECT job_id, content_hash FROM jobs "
+                "WHERE job_id = ? OR legacy_id = ? LIMIT 1",
+                (legacy, legacy),
+            ).fetchone()
+        return row
+
+    def status(self, job):
+        """
+        Returns "new" (unknown fingerprint), "changed" (known fingerprint, different
+        content) or "unchanged".
+        """
+        row = self._find(job)
+        if row is None:
+            return "new"
+        return "unchanged" if row[1] == content_hash(job) else "changed"
+
+    def upsert_jobs(self, jobs):
+        """
+        Inserts the new jobs and replaces the stored version of the changed ones, in
+        one transaction. Unchanged jobs are skipped. A job stored under its legacy
+        ID takes its new ID (see `LEGACY_FINGERPRINT_FIELDS`), quietly if its
+        content is the same.
+        Returns (list of jobs added, list of jobs updated).
+        """
+        added, updated = [], []
+        with self.conn:
+            for job in jobs:
+                key, digest = job_fingerprint(job), content_hash(job)
+                legacy = legacy_fingerprint(job)
+                row = self._find(job)
+                # A job without its new ID (e.g. from an old XML) keeps the stored one
+                if row is not None and key == legacy:
+                    key = row[0]
+                data = json.dumps(job, ensure_ascii=False)
+                if row is not None and row[1] == digest:
+                    if row[0] != key:  # Same job, now with its new ID
+                        self.conn.execute(
+                            "UPDATE jobs SET job_id = ?, data = ? WHERE job_id = ?",
+                            (key, data, row[0]),
+                        )
+                    continue
+                values = (
+                    key,
+                    legacy,
+                    digest,
+                    job.get("source"),
+                    job.get("deadline"),
+                    job.get("publication_date"),
+                    data,
+                    row[0] if row else key,
+                )
+                if row is None:
+                    self.conn.execute(
+                        "INSERT INTO jobs (job_id, legacy_id, content_hash, source, "
+                        "deadline, publication_date, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        values[:-1],
+                    )
+                    added.append(job)
+                else:
+                    self.conn.execute(
+                        "UPDATE jobs SET job_id = ?, legacy_id = ?, content_hash = ?, "
+                        "source = ?, deadline = ?, publication_date = ?, data = ? "
+                        "WHERE job_id = ?",
+                        values,
+                    )
+                    updated.append(job)
+        return added, updated
+
+    def iter_jobs(self, source=None, deadline=None, publication_date=None):
+        """
+        Yields the stored jobs in insertion order, optionally filtered on the
+        indexed columns (exact match).
+        """
+        query = "SELECT data FROM jobs"
+        filters = {
+            "source": source,
+            "deadline": deadline,
+            "publication_date": publication_date,
+        }
+        clauses = [f"{column} = ?" for column, value in filters.items() if value]
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY seq"
+        params = [value for value in filters.values() if value]
+        for (data,) in self.conn.execute(query, params):
+            yield json.loads(data)
+
+    def import_xml(self, xml_file=XML_FILE):
+        """
+        Imports the entries of a jobs XML file (one-time migration, or to pick up
+        an XML edited outside the scraper). Returns the number of jobs added.
+        """
+        if not os.path.exists(xml_file):
+            self.set_meta("xml_stamp", _file_stamp(xml_file))
+            return 0
+        added, _ = self.upsert_jobs(iter_xml_jobs(xml_file))
+        added = len(added)
+        self.set_meta("xml_stamp", _file_stamp(xml_file))
+        print(f"📥 Imported {added} job(s) from {xml_file} into {self.db_file}")
+        return added
+
+    def export_xml(self, xml_file=XML_FILE):
+        """
+        Writes all the stored jobs to `xml_file` (same layout as before: <jobs> with
+        one <entry> per job), through a temporary file.
+        """
+        tmp_file = xml_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n<jobs>")
+            for job in self.iter_jobs():
+                entry = ET.Element("entry")
+                for key, value in job.items():
+                    ET.SubElement(entry, key).text = value
+                f.write(ET.tostring(entry, encoding="unicode"))
+            f.write("</jobs>")
+        os.replace(tmp_file, xml_file)
+        self.set_meta("xml_stamp", _file_stamp(xml_file))
+
+
+def open_store(db_file=DB_FILE, xml_file=XML_FILE, journal_file=JOURNAL_FILE):
+    """
+    Opens the job store, importing `xml_file` and replaying `journal_file` first if
+    the store is new or if the XML changed since the store last wrote or read it.
+    """
+    store = JobStore(db_file)
+    if store.get_meta("xml_stamp") != _file_stamp(xml_file):
+        store.import_xml(xml_file)
+        store.upsert_jobs(job for _, job in iter_journal(journal_file))
+    return store
+
+
+def append_journal(records, journal_file=JOURNAL_FILE):
+    """
+    Appends `(op, job)` records ("new" or "changed") to the journal, one JSON object
+    per line, with a single fsync for the whole batch. Returns the number written.
+    """
+    lines = [
+        json.dumps({"op": op, "job": job}, ensure_ascii=False) + "\n"
+        for op, job in records
+    ]
+    if not lines:
+        return 0
+    with open(journal_file, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(lines)
+
+
+def iter_journal(journal_file=JOURNAL_FILE):
+    """
+    Yields the `(op, job)` records of the journal in write order. A truncated last
+    line (crash while appending) is skipped.
+    """
+    if not os.path.exists(journal_file):
+        return
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            yield record["op"], record["job"]
+
+
+def journal_size(journal_file=JOURNAL_FILE):
+    """
+    Returns the number of records in the journal.
+    """
+    if not os.path.exists(journal_file):
+        return 0
+    with open(journal_file, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def merge_journal(jobs, journal_file=JOURNAL_FILE):
+    """
+    Yields the snapshot jobs with the journal applied: a job updated in the journal
+    is replaced by its latest version (also when it took a new ID, see
+    `LEGACY_FINGERPRINT_FIELDS`), and the journal's new jobs come last.
+    """
+    latest = {}
+    renamed = {}  # Legacy ID -> new ID
+    for _, job in iter_journal(journal_file):
+        key = job_fingerprint(job)
+        latest[key] = job
+        legacy = legacy_fingerprint(job)
+        if legacy is not None and legacy != key:
+            renamed[legacy] = key
+    for job in jobs:
+        if latest:
+            key = job_fingerprint(job)
+            job = latest.pop(renamed.get(key, key), job)
+        yield job
+    yield from latest.values()
+
+
+def compact(
+    store, xml_file=XML_FILE, journal_file=JOURNAL_FILE, backup_file=BACKUP_FILE
+):
+    """
+    Folds the journal back into the snapshot: the current `xml_file` is kept as
+    `backup_file`, the store (which holds every journaled job) is written as the new
+    snapshot, and the journal is emptied.
+    """
+    if os.path.exists(xml_file):
+        shutil.copyfile(xml_file, backup_file)
+    store.export_xml(xml_file)
+    if os.path.exists(journal_file):
+        os.remove(journal_file)
+    print(f"🗜️ Compacted {journal_file} into {xml_file} ({len(store)} jobs)")
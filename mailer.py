@@ -0,0 +1,403 @@
+"""
+SMTP sending for the job notifications (`main.send_email_new_jobs`).
+
+A `Mailer` keeps one authenticated SMTP connection open for a whole batch of emails
+instead of connecting, negotiating TLS and logging in once per subscriber. If the
+server drops the connection (idle timeout, per-connection message limit...), the
+next message reconnects transparently. It also keeps per-message timings and the
+number of failures, printed by `report`.
+
+Emails are not sent directly: they are first stored in a `MailQueue` (SQLite file
+`mail_queue.db`), then `drain` sends them from a few worker threads (one `Mailer`
+each) at a bounded rate. A failed email is scheduled for a retry with exponential
+backoff and left in the queue: `drain` returns as soon as nothing is due, and the
+retry is sent by the next run (or `python main.py mail`). An email is given up only on
+a permanent error, or when it still fails `RETRY_WINDOW` after its first failure.
+Since the queue is on disk, an interrupted run resumes where it stopped: queuing the
+same batch again adds nothing, and the emails already sent are never sent again.
+"""
+
+import email
+import email.utils
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAIL_QUEUE_FILE = "mail_queue.db"
+RETRY_DELAY = 30  # Seconds before the first retry, doubled at each attempt
+MAX_RETRY_DELAY = 3600  # Longest wait between two attempts
+RETRY_WINDOW = 2 * 24 * 3600  # Seconds after the first failure before giving up
+
+# Errors after which the connection is reopened and the message sent again once
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class Mailer:
+    """
+    One reusable SMTP connection. Use it as a context manager:
+
+        with Mailer("smtp.gmail.com", 587, user, password) as mailer:
+            for msg in messages:
+                mailer.send(msg)
+        mailer.report()
+    """
+
+    def __init__(self, smtp_server, smtp_port, user=None, password=None, timeout=30):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.server = None
+        self.connections = 0
+        self.timings = []  # Seconds per message sent
+        self.failures = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def connect(self):
+        """
+        Opens the connection, with STARTTLS and login when the server offers them
+        (a local test server may offer neither).
+        """
+        self.close()
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if server.has_extn("starttls"):
+                server.starttls()  # Secure the connection
+                server.ehlo()
+            if self.user and self.password and server.has_extn("auth"):
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.connections += 1
+
+    def close(self):
+        """
+        Closes the connection, if open.
+        """
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def send(self, msg):
+        """
+        Sends an email message, (re)connecting if needed. Returns the seconds it took.
+        Raises the SMTP error if the message could not be sent; it is counted as a
+        failure.
+        """
+        start = time.perf_counter()
+        try:
+            if self.server is None:
+                self.connect()
+            try:
+                self.server.send_message(msg)
+            except CONNECTION_ERRORS:
+                # Dropped by the server: reconnect and send again, once
+                self.connect()
+                self.server.send_message(msg)
+        except CONNECTION_ERRORS:
+            self.failures += 1
+            self.close()  # Start from a fresh connection next time
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        elapsed = time.perf_counter() - start
+        self.timings.append(elapsed)
+        return elapsed
+
+    def report(self):
+        """
+        Prints the number of emails sent and failed, the connections opened and the
+        message timings.
+        """
+        sent = len(self.timings)
+        if sent:
+            average = sum(self.timings) / sent * 1000
+            slowest = max(self.timings) * 1000
+            timing = (
+                f", {average:.0f} ms per email on average (slowest {slowest:.0f} ms)"
+            )
+        else:
+            timing = ""
+        print(
+            f"📬 {sent} email(s) sent, {self.failures} failed, "
+            f"{self.connections} SMTP connection(s){timing}"
+        )
+
+
+class RateLimiter:
+    """
+    Spaces out events to at most `rate` per second, across threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate and rate > 0 else 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        time.sleep(max(slot - now, 0))
+
+
+def is_permanent(error):
+    """
+    Returns True for the SMTP errors that retrying won't fix: 5xx replies, and
+    recipients all refused with a 5xx code (a 4xx refusal, e.g. greylisting, is
+    retried).
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class MailQueue:
+    """
+    Emails waiting to be sent, stored in SQLite. Each email belongs to a batch (e.g.
+    one notification run) and is unique per (batch, recipient). Its status goes from
+    "pending" to "sending", then "sent" or back to "pending" (retry) or "failed".
+    """
+
+    def __init__(self, db_file=MAIL_QUEUE_FILE):
+        self.db_file = db_file
+        # Shared by the worker threads, behind `lock`
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS emails (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                message BLOB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                first_failure REAL,
+                last_error TEXT,
+                UNIQUE (batch, recipient)
+            );
+            CREATE INDEX IF NOT EXISTS idx_emails_status
+                ON emails (status, next_attempt);
+            """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(emails)")}
+        if "first_failure" not in columns:  # Queue created by an older version
+            with self.conn:
+                self.conn.execute("ALTER TABLE emails ADD COLUMN first_failure REAL")
+            # Older versions also kept the message of the sent emails
+            self.conn.execute("UPDATE emails SET message = X'' WHERE status = 'sent'")
+        # Emails being sent when a previous run stopped: their delivery is unknown,
+        # send them again (they keep their Message-ID, so clients can spot a copy).
+        with self.conn:
+            self.conn.execute(
+                "UPDATE emails SET status = 'pending' WHERE status = 'sending'"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, batch, recipient, msg):
+        """
+        Queues an email message, unless this batch already has one for `recipient`.
+        Returns True if it was added.
+        """
+        if "Message-ID" not in msg:
+            msg["Message-ID"] = email.utils.make_msgid()
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO emails (batch, recipient, message) "
+                "VALUES (?, ?, ?)",
+                (batch, recipient, msg.as_bytes()),
+            )
+        return cursor.rowcount == 1
+
+    def counts(self):
+        """
+        Returns {status: number of emails}.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM emails GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def claim(self):
+        """
+        Marks the next due pending email as "sending" and returns (id, recipient,
+        message), or None if no email is due.
+        """
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id, recipient, message FROM emails WHERE status = 'pending' "
+                "AND next_attempt <= ? ORDER BY next_attempt, id LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+            if row is None:
+                return None
+            email_id, recipient, message = row
+            self.conn.execute(
+                "UPDATE emails SET status = 'sending' WHERE id = ?", (email_id,)
+            )
+        return email_id, recipient, email.message_from_bytes(message)
+
+    def next_retry(self):
+        """
+        Returns the seconds until the next pending email is due (0 if one is due now),
+        or None if no email is pending.
+        """
+        with self.lock:
+            (next_attempt,) = self.conn.execute(
+                "SELECT MIN(next_attempt) FROM emails WHERE status = 'pending'"
+            ).fetchone()
+        return None if next_attempt is None else max(next_attempt - time.time(), 0)
+
+    def retry_now(self):
+        """
+        Makes every pending email due now, ignoring the backoff schedule. Returns the
+        number of pending emails.
+        """
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE emails SET next_attempt = 0 WHERE status = 'pending'"
+            )
+        return cursor.rowcount
+
+    def mark_sent(self, email_id):
+        """
+        Marks an email as sent and drops its message: only (batch, recipient, status)
+        are kept, to never send it again.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE emails SET status = 'sent', attempts = attempts + 1, "
+                "message = X'', last_error = NULL WHERE id = ?",
+                (email_id,),
+            )
+
+    def mark_failed(self, email_id, error, window=RETRY_WINDOW, delay=RETRY_DELAY):
+        """
+        Schedules a retry of a failed email with exponential backoff (and jitter), or
+        gives up on a permanent error or once `window` seconds have passed since its
+        first failure (across runs). Returns the new status.
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            attempts, first_failure = self.conn.execute(
+                "SELECT attempts + 1, COALESCE(first_failure, ?) FROM emails "
+                "WHERE id = ?",
+                (now, email_id),
+            ).fetchone()
+            if is_permanent(error) or now - first_failure >= window:
+                status, next_attempt = "failed", 0
+            else:
+                backoff = min(delay * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+                status = "pending"
+                next_attempt = now + backoff * random.uniform(0.8, 1.2)
+            self.conn.execute(
+                "UPDATE emails SET status = ?, attempts = ?, next_attempt = ?, "
+                "first_failure = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_attempt, first_failure, str(error), email_id),
+            )
+        return status
+
+
+def drain(
+    queue,
+    smtp_server,
+    smtp_port,
+    user=None,
+    password=None,
+    workers=4,
+    rate=None,
+    window=RETRY_WINDOW,
+    delay=RETRY_DELAY,
+):
+    """
+    Sends the due pending emails of `queue` from `workers` threads, each with its own
+    SMTP connection, at most `rate` emails per second overall (None = no limit).
+    Returns as soon as no email is due: the failed emails stay pending, scheduled for
+    a later run (see `MailQueue.mark_failed`).
+    Returns the list of the workers' `Mailer`s (for their statistics).
+    """
+    limiter = RateLimiter(rate)
+
+    def work(mailer):
+        with mailer:
+            while True:
+                claimed = queue.claim()
+                if claimed is None:
+                    return mailer  # Nothing due; retries are left to the next run
+                email_id, recipient, msg = claimed
+                limiter.wait()
+                try:
+                    elapsed = mailer.send(msg)
+                except Exception as e:
+                    status = queue.mark_failed(email_id, e, window, delay)
+                    action = "gave up" if status == "failed" else "will retry"
+                    print(f"❌ Failed to send email to {recipient} ({action}): {e}")
+                else:
+                    queue.mark_sent(email_id)
+                    print(
+                        f"✅ Email sent successfully to {recipient}! "
+                        f"({elapsed * 1000:.0f} ms)"
+                    )
+
+    mailers = [
+        Mailer(smtp_server, smtp_port, user, password) for _ in range(max(workers, 1))
+    ]
+    with ThreadPoolExecutor(max_workers=len(mailers)) as executor:
+        return list(executor.map(work, mailers))
+
+
+def report(mailers, queue=None):
+    """
+    Prints the totals of several `Mailer`s and the state of the queue.
+    """
+    total = Mailer(None, None)
+    for mailer in mailers:
+        total.timings += mailer.timings
+        total.failures += mailer.failures
+        total.connections += mailer.connections
+    total.report()
+    if queue is not None:
+        counts = queue.counts()
+        if counts.get("pending"):
+            wait = queue.next_retry() or 0
+            print(
+                f"⏳ {counts['pending']} email(s) will be retried by the next run "
+                f"(first one due in {wait / 60:.0f} min, or now with "
+                f"'python main.py mail')"
+            )
+        if counts.get("failed"):
+            print(
+                f"⚠️ {counts['failed']} email(s) could not be delivered, "
+                f"see {queue.db_file}"
+            )
@@ -9,31 +9,32 @@
 #
 
 # %%
-import xml.etree.ElementTree as ET  # For XML handling
-import requests  # For HTTP requests
-import certifi  # For SSL certification verification
-from bs4 import BeautifulSoup  # For web scraping
+# Only light standard-library modules are imported here, so that importing this module (or
+# running `python main.py --help`) is instantaneous. The heavy dependencies (requests,
+# BeautifulSoup, pandas, Jinja2, IPython) are imported inside the functions that use them.
 import re  # For regular expressions
 import os  # For file and environment variable management
-import pandas as pd  # For data manipulation
-import smtplib  # For sending emails
-from email.mime.text import MIMEText  # For constructing email messages
-from email.mime.multipart import MIMEMultipart  # For handling email attachments
-from IPython.display import Markdown, display  # For displaying tables in Jupyter
-from dotenv import load_dotenv  # For loading environment variables
-import urllib3  # For managing HTTP connections
-from jinja2 import Environment, FileSystemLoader
+import sys  # For the command line interface
+import argparse  # For the command line interface
+from concurrent.futures import ThreadPoolExecutor  # For fetching sources concurrently
 import datetime
 import csv
-import pprint
-import subprocess
-
-# Suppress SSL warnings for sites with invalid certificates (if necessary)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# Load environment variables from .env file
-load_dotenv()  # For email credentials (SENDER_EMAIL, SENDER_PASSWORD)
-
+import hashlib
+import bisect
+import functools
+import itertools
+import json
+import threading  # For creating the shared HTTP session once
+from jobstore import (  # Indexed job store (SQLite) and journal
+    JOURNAL_FILE,
+    append_journal,
+    content_hash,
+    compact,
+    iter_xml_jobs,
+    journal_size,
+    open_store,
+)
+from feeds import FEED_DIR, update_feeds  # Static Atom feeds
 
 # %%
 
@@ -41,54 +42,458 @@ PREDOC_URL = "https://predoc.org/opportunities"
 NBER_URL = "https://www.nber.org/career-resources/research-assistant-positions-not-nber"
 EJM_URL = "https://econjobmarket.org/market"
 XML_FILE = "jobs.xml"
+DB_FILE = "jobs.db"  # Indexed job store, see jobstore.py
+# Number of journaled jobs after which the journal is folded back into XML_FILE.
+JOURNAL_COMPACT_THRESHOLD = 200
+FETCH_STATE_FILE = "sources/fetch_state.json"
 csv_file_path = "subscribers.csv"
 # Define your GitHub repository link
 GITHUB_REPO_URL = "https://github.com/RickyJ99/RA-rss"
 GITHUB_ISSUE_URL = f"{GITHUB_REPO_URL}/issues"
+# Files used to hand jobs over between the CLI stages (parse -> diff -> notify).
+PARSED_JOBS_FILE = "sources/parsed_jobs.json"
+NEW_JOBS_FILE = "sources/new_jobs.json"
+CHANGED_JOBS_FILE = "sources/changed_jobs.json"
+# Number of processes used to parse the sources (1 = sequential parsing).
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "1"))
+# Emails: SMTP connections sending in parallel, and maximum emails per second.
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "4"))
+MAIL_RATE = float(os.getenv("MAIL_RATE", "5"))
+
+
+# %%
+def _in_notebook():
+    """
+    Returns True when the module runs inside a Jupyter kernel (used to gate the previews).
+    """
+    ipython = sys.modules.get("IPython")
+    shell = ipython.get_ipython() if ipython else None
+    return shell is not None and shell.__class__.__name__ == "ZMQInteractiveShell"
+
+
+def preview_jobs(jobs, limit=10):
+    """
+    Displays the first `limit` jobs as a Markdown table in the notebook.
+    """
+    import pandas as pd  # For data manipulation
+    from IPython.display import Markdown, display  # For displaying tables in Jupyter
+
+    jobs = list(itertools.islice(jobs, limit))
+    display(Markdown(pd.DataFrame(jobs).to_markdown(index=False)))
 
-# %% [markdown]
-# ## Downloading the html
-# The following functions are downloading the HTML content from the sources and it save it in the foulder sources.
-# For PREDOC there is a issue with certificate so it is easy to use curl (bash MacOS)
 
 # %% [markdown]
 # ## Downloading the html
 # The following functions are downloading the HTML content from the sources and it save it in the foulder sources.
-# For PREDOC there is a issue with certificate so it is easy to use curl (bash MacOS)
+# All the sources are fetched **at the same time** (thread pool) over one shared, pooled `requests.Session`, so the
+# wall time of the fetch stage is set by the slowest source and not by the sum of all of them.
+#
+# EJM is then crawled (`crawl_ejm`): its further listing pages and the detail views missing from the listing are
+# downloaded into `sources/ejm/`, at most `EJM_CRAWL_WORKERS` at a time. The scrapers only read these saved files.
+#
+# For PREDOC there is a issue with the certificate chain (the intermediate certificate is not sent), which OpenSSL
+# can't complete with the `certifi` bundle, nor with the CA file of the OS. Its certificate is verified by the
+# certificate verifier of the OS through `truststore` (`"verify": "truststore"` in the `SOURCES` registry), like a
+# browser: on macOS and Windows it fetches the missing intermediate certificate. Everything else is verified with
+# `certifi`. Without `truststore` installed, Predoc is verified with `certifi` (and fails loudly).
 
 # %%
-# Ensure the "sources" directory exists
-os.makedirs("sources", exist_ok=True)
+# Registry of the sources to download: name -> URL, local file and how its SSL
+# certificate is verified ("certifi" bundle, or the OS verifier through "truststore").
+SOURCES = {
+    "predoc": {
+        "url": PREDOC_URL,
+        "filename": "sources/predoc.html",
+        "verify": "truststore",
+    },
+    "nber": {"url": NBER_URL, "filename": "sources/nber.html", "verify": "certifi"},
+    "ejm": {"url": EJM_URL, "filename": "sources/ejm.html", "verify": "certifi"},
+}
+# Further EJM listing pages (page-N.html) and detail views (position-ID.html) crawled
+# after sources/ejm.html.
+EJM_PAGES_DIR = "sources/ejm"
+EJM_DETAIL_URL = "https://econjobmarket.org/positions/{id}"
+EJM_PAGE_LINK = re.compile(r"href=\"([^\"]*[?&](?:amp;)?page=(\d+)[^\"]*)\"")
+EJM_MAX_PAGES = 50
+# Parallel requests of the EJM crawl (0 disables it).
+EJM_CRAWL_WORKERS = int(os.getenv("EJM_CRAWL_WORKERS", "4"))
+
+REQUEST_TIMEOUT = (10, 60)  # (connect, read) timeout in seconds for every request
+USER_AGENT = f"RA-rss job scraper (+{GITHUB_REPO_URL})"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def truststore_adapter(**kwargs):
+    """
+    Returns an `HTTPAdapter` verifying SSL certificates with the certificate verifier
+    of the OS (`truststore`), or None if `truststore` is not installed.
+    """
+    try:
+        import truststore  # For the certificate verifier of the OS
+    except ImportError:
+        return None
+    import ssl  # For the SSL context
+    from requests.adapters import HTTPAdapter  # For the pooled HTTP session
 
-# Download the HTML file using curl
-subprocess.run(
-    ["curl", "-L", "https://predoc.org/opportunities", "-o", "sources/predoc.html"],
-    check=True,
-)
+    class TruststoreAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **pool_kwargs):
+            pool_kwargs["ssl_context"] = truststore.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            super().init_poolmanager(*args, **pool_kwargs)
 
+    return TruststoreAdapter(**kwargs)
 
-# %%
-def download_html(url, filename):
+
+def get_session():
+    """
+    Returns the shared HTTP session, creating it on first use (thread-safe).
+
+    The session keeps connections alive between requests (one pool per host) and
+    retries transient errors (connection resets, 429/5xx) with a small backoff. The
+    sources with `"verify": "truststore"` get an adapter of their own (see
+    `truststore_adapter`).
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return _session
+        import requests  # For HTTP requests
+        from requests.adapters import HTTPAdapter  # For the pooled HTTP session
+        from urllib3.util.retry import Retry  # For retrying transient HTTP errors
+
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=len(SOURCES),
+            pool_maxsize=max(len(SOURCES), EJM_CRAWL_WORKERS),
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        for name, source in SOURCES.items():
+            if source["verify"] != "truststore":
+                continue
+            os_adapter = truststore_adapter(pool_maxsize=1, max_retries=retry)
+            if os_adapter is None:
+                print(f"⚠️ truststore is not installed, verifying {name} with certifi")
+                continue
+            origin = "/".join(source["url"].split("/", 3)[:3]) + "/"
+            session.mount(origin, os_adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        _session = session
+    return _session
+
+
+def load_fetch_state():
+    """
+    Reads the per-source fetch state (ETag, Last-Modified, content hashes) from
+    `FETCH_STATE_FILE`. Returns an empty dictionary if the file is missing or broken.
+    """
+    try:
+        with open(FETCH_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_fetch_state(state):
+    """
+    Writes the fetch state atomically (temporary file + rename).
+    """
+    tmp_file = FETCH_STATE_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, FETCH_STATE_FILE)
+
+
+def file_sha256(filename):
+    """
+    Returns the SHA-256 hex digest of a file, or None if it can't be read.
+    """
+    try:
+        with open(filename, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def ca_certificates(verify="certifi"):
+    """
+    Returns the `verify` argument of requests for a source's verification method: the
+    `certifi` bundle, or True for "truststore" (the session's adapter of the source
+    verifies with the OS, see `get_session`).
+    """
+    import certifi  # For SSL certification verification
+
+    return True if verify == "truststore" else certifi.where()
+
+
+def download_html(url, filename, verify="certifi", session=None, cache=None):
     """
     Downloads the HTML content from the given URL and saves it to the specified filename.
+
+    When a `cache` dictionary is given, the request is conditional: the stored ETag and
+    Last-Modified values are sent back, and a 304 answer (or a body with the same
+    content hash) leaves the local file untouched. The dictionary is updated in place.
+
+    :param verify: How to verify the SSL certificate, "certifi" or "truststore" (see `ca_certificates`).
+    :param session: HTTP session to use (defaults to the shared pooled session).
+    :param cache: Per-source fetch state ("etag", "last_modified", "sha256").
+    :return: "updated", "unchanged", "not_modified" (HTTP 304) or "error".
     """
+    session = session or get_session()
+    cache = {} if cache is None else cache
+
+    headers = {}
+    if os.path.exists(filename):
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
     try:
-        response = requests.get(url, verify=certifi.where())
+        response = session.get(
+            url,
+            headers=headers,
+            verify=ca_certificates(verify),
+            timeout=REQUEST_TIMEOUT,
+        )
+        if response.status_code == 304:
+            print(f"Not modified since last download: {url}")
+            return "not_modified"
         response.raise_for_status()
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(response.text)
+
+        content = response.text.encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        cache["etag"] = response.headers.get("ETag")
+        cache["last_modified"] = response.headers.get("Last-Modified")
+
+        if digest == cache.get("sha256") and os.path.exists(filename):
+            print(f"Unchanged content from {url}")
+            return "unchanged"
+
+        with open(filename, "wb") as f:
+            f.write(content)
+        cache["sha256"] = digest
         print(f"Downloaded HTML from {url} to {filename}")
+        return "updated"
     except Exception as e:
         print(f"Error downloading {url}: {e}")
+        return "error"
+
+
+def fetch_sources(names=None, max_workers=None):
+    """
+    Downloads every registered source (or only the ones in `names`) concurrently,
+    using conditional requests based on the state saved by the previous run.
+
+    :param names: Iterable of keys of `SOURCES`; all sources when None.
+    :param max_workers: Size of the thread pool (default: one thread per source).
+    :return: Dictionary source name -> download status (see `download_html`).
+    """
+    names = list(names) if names else list(SOURCES)
+    # Ensure the 'sources' folder exists.
+    os.makedirs("sources", exist_ok=True)
+    state = load_fetch_state()
+    session = get_session()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(names)) as pool:
+        futures = {
+            name: pool.submit(
+                download_html,
+                SOURCES[name]["url"],
+                SOURCES[name]["filename"],
+                SOURCES[name]["verify"],
+                session=session,
+                cache=state.setdefault(name, {}),
+            )
+            for name in names
+        }
+        results = {name: future.result() for name, future in futures.items()}
+    failed = [name for name, status in results.items() if status == "error"]
+    if failed:
+        print(f"⚠️ Could not download {', '.join(failed)}: keeping the previous pages")
+
+    if "ejm" in results and results["ejm"] != "error" and EJM_CRAWL_WORKERS > 0:
+        crawl_ejm(state["ejm"])
+    save_fetch_state(state)
+    return results
+
+
+def ejm_page_file(number):
+    return os.path.join(EJM_PAGES_DIR, f"page-{number}.html")
+
+
+def ejm_detail_file(position_id):
+    return os.path.join(EJM_PAGES_DIR, f"position-{position_id}.html")
+
 
+def ejm_page_links(html, base_url=None):
+    """
+    Returns {page number: URL} of the further listing pages linked from an EJM
+    listing page (its pagination links, page 1 excepted).
+    """
+    from urllib.parse import urljoin
 
-# Ensure the 'sources' folder exists.
-os.makedirs("sources", exist_ok=True)
+    base_url = base_url or SOURCES["ejm"]["url"]
+    pages = {}
+    for href, number in EJM_PAGE_LINK.findall(html):
+        if int(number) > 1:
+            pages.setdefault(int(number), urljoin(base_url, href.replace("&amp;", "&")))
+    return pages
 
-# Download HTML content for each source.
-download_html(PREDOC_URL, "sources/predoc.html")
-download_html(NBER_URL, "sources/nber.html")
-download_html(EJM_URL, "sources/ejm.html")
+
+def ejm_missing_details(html):
+    """
+    Returns the IDs of the positions of an EJM listing page whose collapsed block
+    (the job details) is missing or empty, in page order.
+    """
+    soup = make_soup(html, listing_strainer("ejm"))
+    missing = []
+    for panel in soup.find_all("div", class_="panel panel-info"):
+        title_a = panel.find("a", id=lambda x: x and x.startswith("title-"))
+        href = title_a.get("href", "") if title_a else ""
+        if not href.startswith("#"):
+            continue
+        collapse_div = panel.find("div", id=href[1:])
+        if collapse_div is None or not collapse_div.get_text(strip=True):
+            missing.append(title_a["id"].removeprefix("title-"))
+    return missing
+
+
+def ejm_listing_files():
+    """
+    Returns the saved EJM listing pages, in page order: `sources/ejm.html`, then the
+    crawled further pages.
+    """
+    pages = []
+    if os.path.isdir(EJM_PAGES_DIR):
+        for name in os.listdir(EJM_PAGES_DIR):
+            match = re.fullmatch(r"page-(\d+)\.html", name)
+            if match:
+                pages.append((int(match.group(1)), os.path.join(EJM_PAGES_DIR, name)))
+    return [SOURCES["ejm"]["filename"]] + [filename for _, filename in sorted(pages)]
+
+
+def crawl_ejm(cache, workers=EJM_CRAWL_WORKERS, max_pages=EJM_MAX_PAGES):
+    """
+    Downloads the further listing pages and the missing detail views linked from
+    the saved EJM page into `EJM_PAGES_DIR`, at most `workers` requests at a time.
+    The pages linked from the downloaded pages are fetched in the next round, up
+    to `max_pages` pages. The files of the pages and positions no longer listed
+    are removed.
+
+    :param cache: Fetch state of EJM; the crawled URLs are kept under "crawl" for
+        conditional requests (see `download_html`).
+    :return: Dictionary file name -> download status.
+    """
+    os.makedirs(EJM_PAGES_DIR, exist_ok=True)
+    previous = cache.get("crawl", {})
+    crawl_cache = cache["crawl"] = {}
+    verify = SOURCES["ejm"]["verify"]
+    session = get_session()
+    results = {}
+    seen_pages = {1}
+    seen_positions = set()
+    to_scan = [SOURCES["ejm"]["filename"]]
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        while to_scan:
+            downloads = {}  # File name -> URL
+            pages = []  # Listing pages among the downloads, scanned next round
+            for filename in to_scan:
+                try:
+                    with open(filename, "r", encoding="utf-8") as f:
+                        html = f.read()
+                except OSError:
+                    continue
+                for number, url in sorted(ejm_page_links(html).items()):
+                    if number not in seen_pages and len(seen_pages) < max_pages:
+                        seen_pages.add(number)
+                        downloads[ejm_page_file(number)] = url
+                        pages.append(ejm_page_file(number))
+                for position_id in ejm_missing_details(html):
+                    if position_id not in seen_positions:
+                        seen_positions.add(position_id)
+                        url = EJM_DETAIL_URL.format(id=position_id)
+                        downloads[ejm_detail_file(position_id)] = url
+
+            futures = {}
+            for filename, url in downloads.items():
+                crawl_cache[url] = previous.get(url, {})
+                futures[filename] = pool.submit(
+                    download_html,
+                    url,
+                    filename,
+                    verify,
+                    session=session,
+                    cache=crawl_cache[url],
+                )
+            results.update({name: future.result() for name, future in futures.items()})
+            to_scan = pages
+
+    for name in os.listdir(EJM_PAGES_DIR):
+        filename = os.path.join(EJM_PAGES_DIR, name)
+        if filename not in results:
+            os.remove(filename)
+    if results:
+        errors = list(results.values()).count("error")
+        print(
+            f"🕸️ EJM crawl: {len(results)} further page(s) and detail view(s), "
+            f"{errors} error(s)"
+        )
+    return results
+
+
+def source_sha256(name):
+    """
+    Returns the SHA-256 hex digest of the local HTML of a source (for EJM, of all its
+    saved pages and detail views), or None if its page can't be read.
+    """
+    filename = SOURCES[name]["filename"]
+    digest = file_sha256(filename)
+    crawled = []
+    if name == "ejm" and digest and os.path.isdir(EJM_PAGES_DIR):
+        crawled = sorted(os.listdir(EJM_PAGES_DIR))
+    if not crawled:
+        return digest
+    digests = [digest] + [
+        f"{page}:{file_sha256(os.path.join(EJM_PAGES_DIR, page))}" for page in crawled
+    ]
+    return hashlib.sha256("\n".join(digests).encode()).hexdigest()
+
+
+def changed_sources(names=None):
+    """
+    Returns the sources whose local HTML differs from the one processed by the last
+    successful run (their `processed_sha256` in the fetch state).
+    """
+    names = list(names) if names else list(SOURCES)
+    state = load_fetch_state()
+    changed = []
+    for name in names:
+        digest = source_sha256(name)
+        # A missing file is left to the scraper, which reports it.
+        if digest is None or digest != state.get(name, {}).get("processed_sha256"):
+            changed.append(name)
+    return changed
+
+
+def mark_sources_processed(names):
+    """
+    Records the current local HTML of each source as processed, so the next run can
+    skip scraping it while it stays the same.
+    """
+    state = load_fetch_state()
+    for name in names:
+        state.setdefault(name, {})["processed_sha256"] = source_sha256(name)
+    save_fetch_state(state)
 
 
 def read_preferences(csv_file):
@@ -145,123 +550,252 @@ def read_preferences(csv_file):
 
 
 # %% [markdown]
-# ## Extract Main Field Helper Function 🔑
+# ## Keyword Classifier 🔑
+#
+# The main field and the program type of a job are found by looking for keywords in its text. The keywords are
+# configured in two tables, `MAIN_FIELD_KEYWORDS` and `PROGRAM_TYPE_KEYWORDS`: each **label** has a list of
+# **variants** (e.g. "Labour" is found as "labour" or "labor"). In a variant, a space or a hyphen also matches
+# the other or nothing ("pre doc" finds "predoc", "pre-doc" and "pre doc").
 #
-# The `extract_main_field` function analyzes a given text to determine which research fields are mentioned. It searches for multiple keywords in a **case-insensitive** manner. If one or more keywords are found, it returns them as a comma‑separated string. If "N/A" are found, it returns `"N/A"`.
+# A `KeywordClassifier` compiles a table **once** into a single case-insensitive regular expression (one
+# alternation with a named group per label), with **word boundaries**: "Economics" is not found inside
+# "Macroeconomics", and "RA" is not found inside "grant". Each text is then scanned in one pass, and
+# `classify_batch()` scans a whole batch of texts in one pass.
 #
-# ### Keywords Included:
-# - **Economics**
-# - **Macroeconomics**
-# - **Microeconomics**
-# - **Labour**
-# - **Industrial Organization**
-# - **Enterpreneurship**
-# - **Healthcare**
-# - **Discrimination**
-# - **Finance**
-# - **Public Policy**
+# - `extract_main_field(text)` returns all the labels found, in table order, as a comma‑separated string (or `None`).
+# - `extract_program_type(text)` returns the first label found in table order (the priority order), or
+#   **"Research Assistant"** by default.
 #
-# You can extend this list with additional fields in economics as needed.
+# You can extend the tables with additional fields or variants as needed; `python benchmark.py classifier`
+# compares the classifier with the previous substring matching on every job in `jobs.xml`.
 
 
 # %%
+# Label -> variants searched for, in output order.
+MAIN_FIELD_KEYWORDS = {
+    "Economics": ["economics"],
+    "Macroeconomics": ["macroeconomics"],
+    "Microeconomics": ["microeconomics"],
+    "Microeconomic theory": ["microeconomic theory"],
+    "Macroeconomic theory": ["macroeconomic theory"],
+    "Labour": ["labour", "labor"],
+    "Industrial Organization": ["industrial organization", "industrial organisation"],
+    "Entrepreneurship": ["entrepreneurship"],
+    "Healthcare": ["healthcare"],
+    "Discrimination": ["discrimination"],
+    "Finance": ["finance"],
+    "Public Policy": ["public policy"],
+    "Local Economic Policy": ["local economic policy"],
+    "Climate": ["climate"],
+}
+
+# Label -> variants searched for, by priority (the first label found wins).
+PROGRAM_TYPE_KEYWORDS = {
+    "PreDoctoral Program": ["pre doctoral", "pre docs", "pre doc"],
+    "Post Doc": ["post doctoral", "post docs", "post doc"],
+    "PhD": ["ph.d", "phd"],
+    "Research Assistant": ["research assistants", "research assistant", "ra", "ras"],
+}
+DEFAULT_PROGRAM_TYPE = "Research Assistant"
+
+
+class KeywordClassifier:
+    """
+    Finds the labels of a keyword table ({label: [variants]}) in texts, with one
+    compiled regular expression. Matching is case-insensitive and on whole words.
+
+    The variants are merged into a character trie before being compiled, e.g.
+    "(?:m(?:acro|icro)economics|...)", so that at each position of the text the regular
+    expression only follows the variants sharing the characters read so far,
+    instead of trying every variant in turn.
+    """
+
+    # Separates the texts of a batch: not a word character, nor matched by a variant.
+    SEPARATOR = "\x00"
+    # Matched between the words of a variant: a space, a hyphen or nothing.
+    WORD_SEPARATOR = r"[\s\-‐‑–]?"
+    # Removes those separators (any of them, e.g. "\xa0") from a match, to look up
+    # its label.
+    STRIP_SEPARATORS = re.compile(r"[\s\-‐‑–]")
+
+    def __init__(self, table):
+        self.labels = list(table)
+        self.keys = {}  # Variant (without separators, or as matched) -> label index
+        trie = {}
+        for index, variants in enumerate(table.values()):
+            for variant in variants:
+                words = re.split(r"[\s\-]+", variant.strip().lower())
+                self.keys.setdefault("".join(words), index)
+                node = trie
+                for position, word in enumerate(words):
+                    if position:
+                        node = node.setdefault(self.WORD_SEPARATOR, {})
+                    for char in word:
+                        node = node.setdefault(re.escape(char), {})
+                node[None] = {}  # End of a variant
+        self.pattern = re.compile(rf"(?<!\w)(?:{self._trie_pattern(trie)})(?!\w)")
+
+    @classmethod
+    def _trie_pattern(cls, node):
+        branches = [
+            edge + cls._trie_pattern(child)
+            for edge, child in node.items()
+            if edge is not None
+        ]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A variant ending here makes the rest optional
+        return f"(?:{pattern})?" if None in node else pattern
+
+    def _label_index(self, match):
+        text = match.group()
+        try:
+            return self.keys[text]
+        except KeyError:
+            # New spelling of a variant (e.g. "pre-doc" for "pre doc"): remember it
+            index = self.keys[text] = self.keys[self.STRIP_SEPARATORS.sub("", text)]
+            return index
+
+    def find(self, text):
+        """
+        Returns the labels found in `text`, in table order.
+        """
+        indices = {self._label_index(m) for m in self.pattern.finditer(text.lower())}
+        return [self.labels[i] for i in sorted(indices)]
+
+    def find_batch(self, texts):
+        """
+        Returns the labels found in each text of `texts` (one scan for the batch).
+        """
+        texts = [text.lower() for text in texts]
+        starts = list(itertools.accumulate(len(text) + 1 for text in texts))
+        found = [set() for _ in texts]
+        for match in self.pattern.finditer(self.SEPARATOR.join(texts)):
+            index = bisect.bisect_right(starts, match.start())
+            found[index].add(self._label_index(match))
+        return [[self.labels[i] for i in sorted(indices)] for indices in found]
+
+
+MAIN_FIELD_CLASSIFIER = KeywordClassifier(MAIN_FIELD_KEYWORDS)
+PROGRAM_TYPE_CLASSIFIER = KeywordClassifier(PROGRAM_TYPE_KEYWORDS)
+
+
 def extract_main_field(text):
     """
-    Looks for keywords in the provided text.
-    Keywords: Economics, Macroeconomics, Microeconomics, Labour, Industrial Organization,
-    Enterpreneurship, Healthcare, Discrimination, Finance, Public Policy.
-    Returns a comma-separated string of all found keywords or "None" if none are found.
-    """
-    keywords = [
-        "Economics",
-        "Macroeconomics",
-        "Microeconomics",
-        "Microeconomic theory",
-        "Macroeconomic theory" "Labour",
-        "Industrial Organization",
-        "Entrepreneurship",
-        "Healthcare",
-        "Discrimination",
-        "Finance",
-        "Public Policy",
-        "Local Economic Policy",
-        "Climate",
-    ]
+    Looks for the `MAIN_FIELD_KEYWORDS` in the provided text.
+    Returns a comma-separated string of all found keywords or None if none are found.
+    """
+    return ", ".join(MAIN_FIELD_CLASSIFIER.find(text)) or None
 
-    found = []
-    for keyword in keywords:
-        if keyword.lower() in text.lower():
-            found.append(keyword)
 
-    if found:
-        # Remove duplicates while preserving order and return as a comma-separated string.
-        unique_keywords = list(dict.fromkeys(found))
-        return ", ".join(unique_keywords)
-    else:
-        return None
+def extract_program_type(text):
+    """
+    Analyzes the provided text (e.g., a job title or description) to determine the program type.
+
+    Returns the first label of `PROGRAM_TYPE_KEYWORDS` found in the text ("PreDoctoral
+    Program", "Post Doc", "PhD" or "Research Assistant"), "Research Assistant" (RA) by
+    default.
+    """
+    found = PROGRAM_TYPE_CLASSIFIER.find(text)
+    return found[0] if found else DEFAULT_PROGRAM_TYPE
 
 
 # %% [markdown]
-# **Function: `extract_program_type(text)`**
-#
-# - **Purpose:**
-#   This function takes a string as input (which might be a job title or description) and determines the program type based on certain keywords.
-#
-# - **How It Works:**
-#   1. **Convert to Lowercase:**
-#      The input text is converted to lowercase to ensure case-insensitive matching.
-#   2. **Keyword Checks:**
-#      - If the text contains any variation of "predoctoral" (e.g., "predoctoral", "pre doc", "pre-doc", "predoc"), it returns **"PreDoctoral Program"**.
-#      - If the text contains any variation of "postdoc" (e.g., "postdoc", "post doc", "post-doc", "postdoctoral", "post doctoral"), it returns **"Post Doc"**.
-#      - If the text contains "phd" or "ph.d", it returns **"PhD"**.
-#      - If the text mentions "research assistant" or even "ra" (for example, in abbreviated or extensive form), it returns **"Research Assistant"**.
-#   3. **Default Category:**
-#      If "N/A" of the keywords are found, the function defaults to returning **"Research Assistant"**.
-#
+# ## Classification Stage 🏷️
 #
+# The scrapers leave `main_field` (and `program_type` for NBER) empty; `classify_jobs()` fills them in as the jobs
+# stream through the pipeline, using the fields that each source provides.
+
+
+# %%
+def classify_jobs(jobs, batch_size=256):
+    """
+    Fills in the main field (and the NBER program type) of each job and yields it.
+    The jobs are classified by batches of `batch_size`, each in one pass of the
+    keyword classifiers (see `KeywordClassifier`), and still yielded as a stream.
+
+    - Predoc: main field from the fields, program title and institution.
+    - NBER: program type from the title, main field from the fields.
+    - EJM: main field from the fields.
+    """
+    jobs = iter(jobs)
+    while batch := list(itertools.islice(jobs, batch_size)):
+        field_texts, title_texts = [], []
+        for job in batch:
+            if job.get("source") == "Predoc":
+                field_texts.append(
+                    " ".join(
+                        [
+                            job.get("fields", "N/A"),
+                            job.get("program_title", "N/A"),
+                            job.get("institution", "N/A"),
+                        ]
+                    )
+                )
+            else:
+                field_texts.append(job.get("fields", ""))
+            if job.get("source") == "NBER":
+                title_texts.append(job["program_title"])
+
+        main_fields = MAIN_FIELD_CLASSIFIER.find_batch(field_texts)
+        program_types = iter(PROGRAM_TYPE_CLASSIFIER.find_batch(title_texts))
+        for job, main_field in zip(batch, main_fields):
+            if job.get("source") in ("Predoc", "NBER", "ejm"):
+                job["main_field"] = ", ".join(main_field) or None
+            if job.get("source") == "NBER":
+                program_type = next(program_types)
+                job["program_type"] = (
+                    program_type[0] if program_type else DEFAULT_PROGRAM_TYPE
+                )
+            yield job
+
+
+# %% [markdown]
+# ## HTML Parser Backend 🥣
 #
+# The scrapers only look at one container of each page (`div.Opportunities`, `div.page-header__intro-inner`,
+# `div.panel.panel-info`), so `make_soup()` is given a **SoupStrainer** and only that container is built into a tree.
+# The parser backend is chosen with the `HTML_PARSER` environment variable:
+# - `html.parser` (default): pure Python, always available.
+# - `lxml`: C parser, several times faster (`pip install lxml`); falls back to `html.parser` if it is not installed.
 #
+# `python benchmark.py parsers` compares the parse time and peak memory of each backend on the files in `sources/`.
 
 
 # %%
-def extract_program_type(text):
-    """
-    Analyzes the provided text (e.g., a job title or description) to determine the program type.
+HTML_PARSER = os.getenv("HTML_PARSER", "html.parser")
 
-    Keywords used:
-      - "PreDoctoral Program" if the text includes variations like "predoctoral", "predoc", etc.
-      - "Post Doc" if the text includes variations like "postdoc", "post-doctoral", etc.
-      - "PhD" if the text includes "phd" or "ph.d".
-      - "Research Assistant" (RA) for all other cases.
 
-    Returns:
-      A string representing the program type.
+def make_soup(html, parse_only=None, parser=None):
     """
-    # Convert the text to lowercase for case-insensitive matching. 🔍
-    text_lower = text.lower()
+    Parses HTML with the configured backend (`HTML_PARSER`), falling back to the
+    built-in "html.parser" when the backend is not installed.
 
-    # Check for PreDoctoral indicators. 🎓
-    if any(kw in text_lower for kw in ["predoctoral", "pre doc", "pre-doc", "predoc"]):
-        return "PreDoctoral Program"
+    :param parse_only: Optional SoupStrainer; only the matching elements are built.
+    :param parser: Backend to use instead of `HTML_PARSER`.
+    """
+    from bs4 import BeautifulSoup, FeatureNotFound  # For web scraping
 
-    # Check for Post Doc indicators. 📚
-    elif any(
-        kw in text_lower
-        for kw in ["postdoc", "post doc", "post-doc", "postdoctoral", "post doctoral"]
-    ):
-        return "Post Doc"
+    try:
+        return BeautifulSoup(html, parser or HTML_PARSER, parse_only=parse_only)
+    except FeatureNotFound:
+        return BeautifulSoup(html, "html.parser", parse_only=parse_only)
 
-    # Check for PhD indicators. 🎓
-    elif "phd" in text_lower or "ph.d" in text_lower:
-        return "PhD"
 
-    # Check for Research Assistant indicators. 💼
-    elif "research assistant" in text_lower or "ra" in text_lower:
-        return "Research Assistant"
+def listing_strainer(name):
+    """
+    Returns the SoupStrainer matching the listing container of a source.
+    """
+    from bs4 import SoupStrainer
 
-    # Default category is Research Assistant (RA). 🔄
-    else:
-        return "Research Assistant"
+    if name == "predoc":
+        return SoupStrainer("div", class_=re.compile("Opportunities"))
+    if name == "nber":
+        return SoupStrainer("div", class_="page-header__intro-inner")
+    if name == "ejm":
+        return SoupStrainer("div", class_="panel panel-info")
+    raise ValueError(f"Unknown source: {name}")
 
 
 # %% [markdown]
@@ -296,115 +830,111 @@ def extract_program_type(text):
 
 
 # %%
-def scrape_predoc():
+def scrape_predoc(html=None):
     """
     Scrapes the pre-doctoral opportunities page from the local HTML file
-    and extracts job details.
-    """
-    jobs = []
+    and yields the details of each job, one at a time.
 
+    :param html: HTML of the page; read from `sources/predoc.html` when None.
+    """
     # Attempt to read the local HTML file. 📂
-    try:
-        with open("sources/predoc.html", "r", encoding="utf-8") as f:
-            html = f.read()
-    except Exception as e:
-        print(
-            "Error reading sources/predoc.html. Please download the HTML from predoc before proceeding. 🚫"
-        )
-        return jobs  # Return an empty list if the file can't be read.
+    if html is None:
+        try:
+            with open("sources/predoc.html", "r", encoding="utf-8") as f:
+                html = f.read()
+        except Exception as e:
+            print(
+                "Error reading sources/predoc.html. Please download the HTML from predoc before proceeding. 🚫"
+            )
+            return  # No jobs if the file can't be read.
 
-    # Parse the HTML content using BeautifulSoup. 🥣
-    soup = BeautifulSoup(html, "html.parser")
+    # Parse only the opportunities container using BeautifulSoup. 🥣
+    soup = make_soup(html, listing_strainer("predoc"))
 
     # Find the container holding the opportunities using a regex on the class name. 🔍
     container = soup.find("div", class_=re.compile("Opportunities"))
     if not container:
         print("No Predoc container found. 😢")
-        return jobs
+        return
 
     # Loop over each article element within the container. 📝
-    articles = container.find_all("article")
-    for article in articles:
-        job = {}
-        job["source"] = "Predoc"  # Mark the source as 'predoc'. 🌟
-
-        # Extract the title and link from the <h2> element. 🏷️
-        h2 = article.find("h2")
-        if h2:
-            a_tag = h2.find("a")
-            if a_tag:
-                job["program_title"] = a_tag.get_text(strip=True)
-                job["link"] = a_tag.get("href", "N/A").strip()
-            else:
-                job["program_title"] = "N/A"
-                job["link"] = "N/A"
+    for article in container.find_all("article"):
+        # Yield the extracted job details. ✅
+        yield parse_predoc_article(article)
+
+
+def parse_predoc_article(article):
+    """
+    Extracts the job details of one Predoc `<article>` element.
+    """
+    job = {}
+    job["source"] = "Predoc"  # Mark the source as 'predoc'. 🌟
+
+    # Extract the title and link from the <h2> element. 🏷️
+    h2 = article.find("h2")
+    if h2:
+        a_tag = h2.find("a")
+        if a_tag:
+            job["program_title"] = a_tag.get_text(strip=True)
+            job["link"] = a_tag.get("href", "N/A").strip()
         else:
             job["program_title"] = "N/A"
             job["link"] = "N/A"
-
-        # Extract details from the "copy" div. 🗒️
-        copy_div = article.find("div", class_="copy")
-        if copy_div:
-            p = copy_div.find("p")
-            if p:
-                text = p.get_text(separator=" ", strip=True)
-                # Use regex to capture specific fields from the text. 🔍
-                researcher_match = re.search(
-                    r"Sponsoring Researcher\(s\):\s*(.*?)\s*Sponsoring Institution:",
-                    text,
-                )
-                institution_match = re.search(
-                    r"Sponsoring Institution:\s*(.*?)\s*Fields of Research", text
-                )
-                fields_match = re.search(
-                    r"Fields of Research\s*:\s*(.*?)\s*Deadline:", text
-                )
-                deadline_match = re.search(r"Deadline:\s*(.*)", text)
-                job["sponsor"] = (
-                    researcher_match.group(1).strip() if researcher_match else "N/A"
-                )
-                job["institution"] = (
-                    institution_match.group(1).strip() if institution_match else "N/A"
-                )
-                job["fields"] = fields_match.group(1).strip() if fields_match else "N/A"
-                job["deadline"] = (
-                    deadline_match.group(1).strip() if deadline_match else "N/A"
-                )
-            else:
-                job["sponsor"] = "N/A"
-                job["institution"] = "N/A"
-                job["fields"] = "N/A"
-                job["deadline"] = "N/A"
+    else:
+        job["program_title"] = "N/A"
+        job["link"] = "N/A"
+
+    # Extract details from the "copy" div. 🗒️
+    copy_div = article.find("div", class_="copy")
+    if copy_div:
+        p = copy_div.find("p")
+        if p:
+            text = p.get_text(separator=" ", strip=True)
+            # Use regex to capture specific fields from the text. 🔍
+            researcher_match = re.search(
+                r"Sponsoring Researcher\(s\):\s*(.*?)\s*Sponsoring Institution:",
+                text,
+            )
+            institution_match = re.search(
+                r"Sponsoring Institution:\s*(.*?)\s*Fields of Research", text
+            )
+            fields_match = re.search(
+                r"Fields of Research\s*:\s*(.*?)\s*Deadline:", text
+            )
+            deadline_match = re.search(r"Deadline:\s*(.*)", text)
+            job["sponsor"] = (
+                researcher_match.group(1).strip() if researcher_match else "N/A"
+            )
+            job["institution"] = (
+                institution_match.group(1).strip() if institution_match else "N/A"
+            )
+            job["fields"] = fields_match.group(1).strip() if fields_match else "N/A"
+            job["deadline"] = (
+                deadline_match.group(1).strip() if deadline_match else "N/A"
+            )
         else:
             job["sponsor"] = "N/A"
             job["institution"] = "N/A"
             job["fields"] = "N/A"
             job["deadline"] = "N/A"
+    else:
+        job["sponsor"] = "N/A"
+        job["institution"] = "N/A"
+        job["fields"] = "N/A"
+        job["deadline"] = "N/A"
 
-        # Add additional fields for consistency. 🛠️
-        job["university"] = "N/A"
-        job["program_type"] = "N/A"
-        job["publication_date"] = "N/A"
-
-        # Determine the main field by combining text from various fields. 🔑
-        text_to_search = " ".join(
-            [
-                job.get("fields", "N/A"),
-                job.get("program_title", "N/A"),
-                job.get("institution", "N/A"),
-            ]
-        )
-        job["main_field"] = extract_main_field(text_to_search)
-
-        # Append the extracted job details to the jobs list. ✅
-        jobs.append(job)
+    # Add additional fields for consistency. 🛠️
+    job["university"] = "N/A"
+    job["program_type"] = "N/A"
+    job["publication_date"] = "N/A"
+    job["main_field"] = None  # Filled in by `classify_jobs`. 🔑
 
-    # Return the list of all extracted job details. 📤
-    return jobs
+    return job
 
 
-df = pd.DataFrame(scrape_predoc()).head(10).to_markdown(index=False)
-display(Markdown(df))
+# Preview of the scraped jobs (notebook only).
+if _in_notebook():
+    preview_jobs(classify_jobs(scrape_predoc()))
 
 # %% [markdown]
 # # Web Scraping Section for NBER (Local HTML) 🔎
@@ -421,9 +951,11 @@ display(Markdown(df))
 #   It finds the `<div>` with class `page-header__intro-inner` that holds the job details.
 #
 # - **✂️ Skip Header Paragraphs:**
-#   The first three `<p>` elements are skipped as they contain header information.
+#   The first two `<p>` elements are skipped as they contain header information.
 #
 # - **📋 Extract Job Details:**
+#   Each posting is one `<p>` whose lines are separated by `<br>` tags. The parsed tree of the paragraph is walked once
+#   (`split_nber_lines`), collecting the text and the first link of each line, without serializing it back to HTML.
 #   For each job posting, the function extracts:
 #   - Program title
 #   - Sponsor
@@ -444,10 +976,8 @@ display(Markdown(df))
 def scrape_nber():
     """
     Scrapes the NBER research assistant positions page from a local HTML file
-    and extracts job details.
+    and yields the details of each job, one at a time.
     """
-    jobs = []
-
     # Attempt to read the local HTML file. 📂
     try:
         with open("sources/nber.html", "r", encoding="utf-8") as f:
@@ -456,340 +986,358 @@ def scrape_nber():
         print(
             "Error reading sources/nber.html. Please download the HTML from NBER before proceeding. 🚫"
         )
-        return jobs  # Return an empty list if the file can't be read.
+        return  # No jobs if the file can't be read.
 
-    # Parse the HTML content using BeautifulSoup. 🥣
-    soup = BeautifulSoup(html, "html.parser")
+    # Parse only the job container using BeautifulSoup. 🥣
+    soup = make_soup(html, listing_strainer("nber"))
 
     # Find the container holding the job details using its class name. 🔍
     container = soup.find("div", class_="page-header__intro-inner")
     if container:
         # Get all <p> elements inside the container. 📝
         paragraphs = container.find_all("p")
-        # Skip the first three header paragraphs. ✂️
+        # Skip the first header paragraphs. ✂️
         for p in paragraphs[2:]:
-            job = {}
-            job["source"] = "NBER"  # Mark the source as NBER. 🌟
-            parts = p.decode_contents().split("<br>")[0].split("<br/>")
-
-            if len(parts) >= 4:
-                job["program_title"] = parts[0].strip()
-                job["sponsor"] = (
-                    parts[1].replace("NBER Sponsoring Researcher(s):", "").strip()
-                )
-                job["institution"] = parts[2].replace("Institution:", "").strip()
-                if (
-                    len(
-                        parts[3]
-                        .replace("Field(s) of Research:", "")
-                        .strip()
-                        .split("&amp")
-                    )
-                    > 1
-                ):
-                    fields = "".join(
-                        field.strip()
-                        for field in parts[3]
-                        .replace("Field(s) of Research:", "")
-                        .strip()
-                        .split("&amp")
-                    )
-                else:
-                    fields = parts[3].replace("Field(s) of Research:", "").strip()
-                if len(fields.split(";")) > 1:
-                    fields = ", ".join(field.strip() for field in fields.split(";"))
-
-                if len(fields.split(":")) > 1:
-                    fields = fields.split(":")[1]
-                job["fields"] = fields
-                job["program_type"] = extract_program_type(job["program_title"])
-                # Combine text fields (program title and university) to determine the main field. 🔑
-                text_to_search = fields
-                job["main_field"] = extract_main_field(text_to_search)
-                # Extract the job link from the HTML in the last part. 🔗
-                link_soup = BeautifulSoup(parts[4], "html.parser")
-                a_tag = link_soup.find("a")
-                job["link"] = a_tag["href"] if a_tag else ""
-                job["deadline"] = "N/A"  # Deadline not provided. ⏰
-                job["publication_date"] = "N/A"
-                # Append the extracted job to our list. ✅
-                jobs.append(job)
+            job = parse_nber_paragraph(p)
+            if job is not None:
+                yield job  # Yield the extracted job. ✅
     else:
         print("NBER container not found. 😢")
 
-    # Return the list of all extracted job details. 📤
-    return jobs
 
+def split_nber_lines(p):
+    """
+    Splits an NBER `<p>` element at its `<br>` tags in one walk of the parsed tree.
+    Returns one `(text, first <a> tag or None)` pair per line.
+    """
+    from bs4 import Comment, NavigableString
+
+    lines = [([], None)]
+    for node in p.descendants:
+        if isinstance(node, NavigableString):
+            if not isinstance(node, Comment):
+                lines[-1][0].append(str(node))
+        elif node.name == "br":
+            lines.append(([], None))
+        elif node.name == "a" and lines[-1][1] is None:
+            lines[-1] = (lines[-1][0], node)
+    return [("".join(texts), a_tag) for texts, a_tag in lines]
 
-df = pd.DataFrame(scrape_nber()).head(10).to_markdown(index=False)
-display(Markdown(df))
+
+def parse_nber_paragraph(p):
+    """
+    Extracts the job details of one NBER `<p>` element (lines: title, sponsor,
+    institution, fields, link). Returns None if it is not a job listing.
+    """
+    lines = split_nber_lines(p)
+    if len(lines) < 4:
+        return None
+    parts = [text for text, _ in lines]
+
+    job = {}
+    job["source"] = "NBER"  # Mark the source as NBER. 🌟
+    job["program_title"] = parts[0].strip()
+    job["sponsor"] = parts[1].replace("NBER Sponsoring Researcher(s):", "").strip()
+    job["institution"] = parts[2].replace("Institution:", "").strip()
+    fields = parts[3].replace("Field(s) of Research:", "").strip()
+    if len(fields.split("&")) > 1:
+        # "A & B" -> "A; B", split below like the other lists
+        fields = "; ".join(field.strip() for field in fields.split("&"))
+    if len(fields.split(";")) > 1:
+        fields = ", ".join(field.strip() for field in fields.split(";"))
+
+    if len(fields.split(":")) > 1:
+        fields = fields.split(":")[1]
+    job["fields"] = fields
+    # Program type and main field are filled in by `classify_jobs`. 🔑
+    job["program_type"] = None
+    job["main_field"] = None
+    # The job link is the first link of the last line. 🔗
+    a_tag = lines[4][1] if len(lines) > 4 else None
+    job["link"] = a_tag.get("href", "") if a_tag else ""
+    job["deadline"] = "N/A"  # Deadline not provided. ⏰
+    job["publication_date"] = "N/A"
+    return job
+
+
+# Preview of the scraped jobs (notebook only).
+if _in_notebook():
+    preview_jobs(classify_jobs(scrape_nber()))
 
 # %% [markdown]
 # ### Web Scraping Section for EJM (Econ Job Market) 🔎
 #
-# This function is designed to scrape job postings from the Econ Job Market (EJM) page. It performs the following tasks:
+# This function is designed to scrape job postings from the locally saved Econ Job Market (EJM) pages. It performs
+# the following tasks:
 #
-# - **🌐 Fetching the Page:**
-#   It sends an HTTP GET request to the EJM URL using the `requests` library.
+# - **📂 Reading the Saved Pages:**
+#   It reads `sources/ejm.html` and the further listing pages crawled into `sources/ejm/` by the fetch stage
+#   (`crawl_ejm`), in page order. No request is sent while scraping.
 #
 # - **🥣 Parsing HTML:**
-#   The response content is parsed with BeautifulSoup to create a DOM structure for extraction.
+#   Each page is parsed with BeautifulSoup, keeping only the job panels (`listing_strainer("ejm")`).
 #
 # - **🔍 Locating Job Panels:**
 #   It finds all `<div>` elements with the classes `"panel panel-info"`, each representing a job posting.
 #
 # - **🏷️ Extracting Job Details:**
 #   For each panel, it extracts:
-#   - **Job Title & Link:** Located within an `<a>` tag with an ID starting with "title-".
+#   - **Job Title, Position ID & Link:** Located within an `<a>` tag with an ID "title-<position ID>". The position
+#     ID identifies the job in the job store. Details missing from the listing are read from the saved detail view.
 #   - **University & Program Type:** Extracted from `<div>` elements with class `"col-md-4"` and `"col-md-2"`, respectively.
 #   - **Publication Date & Deadline:** Extracted from `<div>` elements with class `"col-md-2"`.
 #   - **Default Values:** Fields such as **sponsor**, **institution**, and **fields** are set to `"N/A"` since they're not provided.
 #
 # - **🔑 Determining the Main Field:**
-#   It combines the program title and university information to deduce the primary research field using the helper function `extract_main_field()`.
+#   The main field is left empty here; `classify_jobs()` fills it in afterwards.
 #
-# - **✅ Building the Result List:**
-#   Each job is stored as a dictionary, and all such dictionaries are appended to a list which is then returned.
+# - **✅ Yielding the Jobs:**
+#   Each job is yielded as a dictionary, one panel at a time.
 #
 #
 
 
 # %%
-def scrape_ejm():
+def scrape_ejm(html=None):
     """
     Scrapes the Econ Job Market (EJM) page and extracts detailed job information
     from the newer HTML structure. Post-processing steps include:
       - Merging single/multiple salaries into one cell.
       - Parsing sponsor(s) from text referencing "Professors ..."
       - Removing extraneous punctuation in 'fields' (bullet '•', semicolon ';', repeated commas).
-      - Replacing 'link' with the final application link (or "N/A" if missing).
-      - Inheriting 'start_date' if 'Flexible' from a previous non-Flexible record.
 
-    Returns a list of dictionaries.
+    The page-level steps (replacing 'link' with the final application link and
+    inheriting the 'Flexible' start dates) are done by `normalize_jobs`.
+
+    :param html: HTML of one listing page; by default the saved pages, downloaded by
+        the fetch stage (`sources/ejm.html` and the crawled pages, see `crawl_ejm`).
+    Yields one raw dictionary per job.
     """
-    EJM_URL = "https://econjobmarket.org/market"
-    jobs = []
+    if html is None:
+        # Attempt to read the local HTML files. 📂
+        try:
+            pages = []
+            for filename in ejm_listing_files():
+                with open(filename, "r", encoding="utf-8") as f:
+                    pages.append(f.read())
+        except Exception as e:
+            print(
+                "Error reading sources/ejm.html. Please download the HTML from EJM before proceeding. 🚫"
+            )
+            return  # No jobs if the file can't be read.
+    else:
+        pages = [html]
 
     try:
-        response = requests.get(EJM_URL)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
+        for page in pages:
+            yield from _iter_ejm_page(page)
+    except Exception as e:
+        print("Error during EJM scraping:", e)
 
-        # Each job listing is typically under <div class="panel panel-info">
-        panels = soup.find_all("div", class_="panel panel-info")
-        for panel in panels:
-            job = {}
-            job["source"] = "ejm"
 
-            # ---------- MAIN ROW (col-md-4, col-md-4, col-md-2, col-md-2) ----------
-            main_row = panel.find("div", class_="row")
-            if not main_row:
-                continue
+def _iter_ejm_page(html):
+    """
+    Yields the raw job of each panel of one EJM listing page.
+    """
+    # Parse only the job panels.
+    soup = make_soup(html, listing_strainer("ejm"))
 
-            cols = main_row.find_all("div", recursive=False)
+    # Each job listing is typically under <div class="panel panel-info">
+    panels = soup.find_all("div", class_="panel panel-info")
+    for panel in panels:
+        job = parse_ejm_panel(panel)
+        if job is not None:
+            yield job
 
-            # --- FIRST COLUMN: title, location, start_date, duration ---
-            if len(cols) >= 1:
-                first_col = cols[0]
-                title_a = first_col.find("a", id=lambda x: x and x.startswith("title-"))
 
-                if title_a:
-                    job["program_title"] = title_a.get_text(strip=True)
-                    # We'll store a temporary link here; final link will become 'application_link'
-                    job["temp_link"] = title_a.get("href", "").strip()
-                else:
-                    job["program_title"] = "N/A"
-                    job["temp_link"] = ""
-
-                col_text = first_col.get_text(separator="\n", strip=True).split("\n")
-                # Often line 2 is location
-                job["location"] = col_text[1].strip() if len(col_text) >= 2 else "N/A"
-
-                job["start_date"] = "N/A"
-                job["duration"] = "N/A"
-                for line in col_text:
-                    lower_line = line.lower()
-                    if lower_line.startswith("starts"):
-                        clean_line = line.replace("Starts", "").replace(".", "").strip()
-                        job["start_date"] = clean_line if clean_line else "N/A"
-                    elif lower_line.startswith("duration"):
-                        clean_line = line.replace("Duration:", "").strip()
-                        job["duration"] = clean_line if clean_line else "N/A"
-
-            # --- SECOND COLUMN: department, university ---
-            if len(cols) >= 2:
-                second_col = cols[1]
-                lines_2 = second_col.get_text(separator="\n", strip=True).split("\n")
-                job["department"] = lines_2[0].strip() if len(lines_2) >= 1 else "N/A"
-                job["university"] = lines_2[1].strip() if len(lines_2) >= 2 else "N/A"
-
-            # --- THIRD COLUMN: program_type, fields ---
-            if len(cols) >= 3:
-                third_col = cols[2]
-                program_text = third_col.get_text(separator="\n", strip=True).split(
-                    "\n", 1
-                )
-                job["program_type"] = program_text[0].strip() if program_text else "N/A"
+def read_ejm_detail(title_id, collapse_div_id):
+    """
+    Returns the details of a position from its saved detail view (see `crawl_ejm`):
+    the element with the id of the collapsed block, or the whole page. Returns None
+    if the detail view was not downloaded.
+    """
+    filename = ejm_detail_file(title_id.removeprefix("title-"))
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            soup = make_soup(f.read())
+    except OSError:
+        return None
+    return soup.find(id=collapse_div_id) or soup.body or soup
 
-                fields_div = third_col.find("div", id=re.compile(r"cats-\d+"))
-                if fields_div:
-                    fields_raw = fields_div.get_text(separator=", ", strip=True)
-                else:
-                    fields_raw = (
-                        program_text[1].strip() if len(program_text) > 1 else ""
-                    )
 
-                # Clean fields: remove bullet dots, semicolons, repeated commas
-                fields_clean = re.sub(r"[•;]", "", fields_raw)
-                fields_clean = re.sub(r",\s*,", ",", fields_clean)
-                fields_clean = re.sub(r"\s+", " ", fields_clean).strip(" ,")
-                job["fields"] = fields_clean if fields_clean else "N/A"
+def parse_ejm_panel(panel):
+    """
+    Extracts the job details of one EJM `<div class="panel panel-info">` element.
+    Returns None if the panel has no main row. The link and the 'Flexible' start
+    dates are fixed afterwards by `normalize_jobs`.
+    """
+    job = {}
+    job["source"] = "ejm"
 
-            # --- FOURTH COLUMN: publication_date, deadline ---
-            if len(cols) >= 4:
-                fourth_col = cols[3]
-                spans = fourth_col.find_all("span")
+    # ---------- MAIN ROW (col-md-4, col-md-4, col-md-2, col-md-2) ----------
+    main_row = panel.find("div", class_="row")
+    if not main_row:
+        return None
 
-                job["publication_date"] = (
-                    spans[0].get_text(strip=True) if len(spans) > 0 else "N/A"
-                )
-                job["deadline"] = (
-                    spans[1].get_text(strip=True) if len(spans) > 1 else "N/A"
-                )
-            else:
-                job["program_type"] = job.get("program_type") or "N/A"
-                job["publication_date"] = "N/A"
-                job["deadline"] = "N/A"
-                job["fields"] = job.get("fields") or "N/A"
+    cols = main_row.find_all("div", recursive=False)
 
-            # Placeholders for collapsed info
-            job["sponsor"] = "N/A"
-            job["institution"] = job["university"]
-            job["main_field"] = extract_main_field(job["fields"])
-            job["degree_required"] = "N/A"
-            job["salary_range"] = "N/A"
-            job["application_link"] = "N/A"
-
-            # ---------- COLLAPSE BLOCK (extended info) ----------
-            if title_a:
-                collapse_id = title_a.get("href", "")
-                if collapse_id.startswith("#"):
-                    collapse_div_id = collapse_id[1:]
-                    collapse_div = panel.find("div", id=collapse_div_id)
-                    if collapse_div:
-                        # We'll parse the entire collapse text in one go
-                        collapse_text = collapse_div.get_text(
-                            separator="\n", strip=True
-                        )
+    # --- FIRST COLUMN: title, location, start_date, duration ---
+    if len(cols) >= 1:
+        first_col = cols[0]
+        title_a = first_col.find("a", id=lambda x: x and x.startswith("title-"))
 
-                        # Parse sponsor(s) from text with "Professors" ...
-                        # We'll look for a pattern: "Professors (.*?)." or "Professor (.*?)."
-                        # This is a heuristic; adjust to your content.
-                        prof_match = re.search(
-                            r"(?:[Pp]rofessors?\s+)(.*?)(?:\.|$)", collapse_text
-                        )
-                        if prof_match:
-                            sponsor_str = prof_match.group(1)
-                            # Replace ' and ' with comma
-                            sponsor_str = sponsor_str.replace(" and ", ", ")
-                            # Split by commas
-                            sponsor_list = [
-                                x.strip() for x in sponsor_str.split(",") if x.strip()
-                            ]
-                            # Re-join with commas
-                            job["sponsor"] = ", ".join(sponsor_list)
-
-                        # We'll search within <div> tags with <strong> for structured data
-                        additional_divs = collapse_div.find_all("div")
-                        for div_item in additional_divs:
-                            strong_tag = div_item.find("strong")
-                            if strong_tag:
-                                label = strong_tag.get_text(strip=True).lower()
-                                val = div_item.get_text(separator="\n", strip=True)
-                                # remove the strong text from val
-                                val = val.replace(
-                                    strong_tag.get_text(strip=True), ""
-                                ).strip(": \n")
-
-                                if "degree required" in label:
-                                    job["degree_required"] = val if val else "N/A"
-                                elif "job start date" in label:
-                                    job["start_date"] = val if val else "N/A"
-                                elif "job duration" in label:
-                                    job["duration"] = val if val else "N/A"
-                                elif "salary" in label:
-                                    # unify multiple lines for salary
-                                    raw_lines = val.split("\n")
-                                    unified = " ".join(
-                                        x.strip() for x in raw_lines if x.strip()
-                                    )
-                                    job["salary_range"] = unified if unified else "N/A"
-
-                        # Try to parse "To Apply" link
-                        apply_paragraph = collapse_div.find(
-                            "p", text=re.compile(r"To\s+Apply", re.IGNORECASE)
-                        )
-                        if apply_paragraph:
-                            next_link = apply_paragraph.find_next("a", href=True)
-                            if next_link:
-                                job["application_link"] = next_link.get("href", "N/A")
-                        else:
-                            # or search any <a> with 'apply' in text
-                            apply_a = collapse_div.find(
-                                "a", href=True, text=re.compile(r"apply", re.IGNORECASE)
-                            )
-                            if apply_a:
-                                job["application_link"] = apply_a.get("href", "N/A")
+        if title_a:
+            job["program_title"] = title_a.get_text(strip=True)
+            # EJM's ID of the position, which identifies the job (see jobstore.py)
+            job["position_id"] = title_a["id"].removeprefix("title-")
+            # We'll store a temporary link here; final link will become 'application_link'
+            job["temp_link"] = title_a.get("href", "").strip()
+        else:
+            job["program_title"] = "N/A"
+            job["position_id"] = "N/A"
+            job["temp_link"] = ""
+
+        col_text = first_col.get_text(separator="\n", strip=True).split("\n")
+        # Often line 2 is location
+        job["location"] = col_text[1].strip() if len(col_text) >= 2 else "N/A"
+
+        job["start_date"] = "N/A"
+        job["duration"] = "N/A"
+        for line in col_text:
+            lower_line = line.lower()
+            if lower_line.startswith("starts"):
+                clean_line = line.replace("Starts", "").replace(".", "").strip()
+                job["start_date"] = clean_line if clean_line else "N/A"
+            elif lower_line.startswith("duration"):
+                clean_line = line.replace("Duration:", "").strip()
+                job["duration"] = clean_line if clean_line else "N/A"
+
+    # --- SECOND COLUMN: department, university ---
+    if len(cols) >= 2:
+        second_col = cols[1]
+        lines_2 = second_col.get_text(separator="\n", strip=True).split("\n")
+        job["department"] = lines_2[0].strip() if len(lines_2) >= 1 else "N/A"
+        job["university"] = lines_2[1].strip() if len(lines_2) >= 2 else "N/A"
+
+    # --- THIRD COLUMN: program_type, fields ---
+    if len(cols) >= 3:
+        third_col = cols[2]
+        program_text = third_col.get_text(separator="\n", strip=True).split("\n", 1)
+        job["program_type"] = program_text[0].strip() if program_text else "N/A"
+
+        fields_div = third_col.find("div", id=re.compile(r"cats-\d+"))
+        if fields_div:
+            fields_raw = fields_div.get_text(separator=", ", strip=True)
+        else:
+            fields_raw = program_text[1].strip() if len(program_text) > 1 else ""
 
-            jobs.append(job)
+        # Clean fields: remove bullet dots, semicolons, repeated commas
+        fields_clean = re.sub(r"[•;]", "", fields_raw)
+        fields_clean = re.sub(r",\s*,", ",", fields_clean)
+        fields_clean = re.sub(r"\s+", " ", fields_clean).strip(" ,")
+        job["fields"] = fields_clean if fields_clean else "N/A"
 
-    except Exception as e:
-        print("Error during EJM scraping:", e)
+    # --- FOURTH COLUMN: publication_date, deadline ---
+    if len(cols) >= 4:
+        fourth_col = cols[3]
+        spans = fourth_col.find_all("span")
 
-    # ---------- POST-PROCESSING ----------
-    # (1) Replace 'link' with final 'application_link', or "N/A" if missing/'https://econjobmarket.org'
-    # (2) If 'start_date' == 'Flexible', copy from the nearest preceding non-Flexible record
-    for i, job in enumerate(jobs):
-        # (1) link substitution
-        app_link = job["application_link"]
-        if (
-            not app_link
-            or app_link.strip() == ""
-            or app_link.strip() == "https://econjobmarket.org"
-        ):
-            job["link"] = "N/A"
-        else:
-            job["link"] = app_link
-
-        # (2) if 'start_date' is 'Flexible', inherit from previous
-        sd = job.get("start_date")
-        if isinstance(sd, str) and sd.lower() == "flexible":
-            new_date = "N/A"
-            # look upward
-            for j in range(i - 1, -1, -1):
-                prev_sd = jobs[j].get("start_date")
-                if (
-                    prev_sd
-                    and isinstance(prev_sd, str)
-                    and prev_sd.lower() != "flexible"
-                ):
-                    new_date = prev_sd
-                    break
-            job["start_date"] = new_date  # can be "N/A" if never found
-
-    # Remove temp columns
-    for job in jobs:
-        if "temp_link" in job:
-            del job["temp_link"]
-        if "application_link" in job:
-            del job["application_link"]
+        job["publication_date"] = (
+            spans[0].get_text(strip=True) if len(spans) > 0 else "N/A"
+        )
+        job["deadline"] = spans[1].get_text(strip=True) if len(spans) > 1 else "N/A"
+    else:
+        job["program_type"] = job.get("program_type") or "N/A"
+        job["publication_date"] = "N/A"
+        job["deadline"] = "N/A"
+        job["fields"] = job.get("fields") or "N/A"
+
+    # Placeholders for collapsed info
+    job["sponsor"] = "N/A"
+    job["institution"] = job["university"]
+    job["main_field"] = None  # Filled in by `classify_jobs`
+    job["degree_required"] = "N/A"
+    job["salary_range"] = "N/A"
+    job["application_link"] = "N/A"
+
+    # ---------- COLLAPSE BLOCK (extended info) ----------
+    if title_a:
+        collapse_id = title_a.get("href", "")
+        if collapse_id.startswith("#"):
+            collapse_div_id = collapse_id[1:]
+            collapse_div = panel.find("div", id=collapse_div_id)
+            if collapse_div is None or not collapse_div.get_text(strip=True):
+                # Not inline: detail view saved by the crawl, if any
+                collapse_div = read_ejm_detail(title_a.get("id", ""), collapse_div_id)
+            if collapse_div:
+                # We'll parse the entire collapse text in one go
+                collapse_text = collapse_div.get_text(separator="\n", strip=True)
+
+                # Parse sponsor(s) from text with "Professors" ...
+                # We'll look for a pattern: "Professors (.*?)." or "Professor (.*?)."
+                # This is a heuristic; adjust to your content.
+                prof_match = re.search(
+                    r"(?:[Pp]rofessors?\s+)(.*?)(?:\.|$)", collapse_text
+                )
+                if prof_match:
+                    sponsor_str = prof_match.group(1)
+                    # Replace ' and ' with comma
+                    sponsor_str = sponsor_str.replace(" and ", ", ")
+                    # Split by commas
+                    sponsor_list = [
+                        x.strip() for x in sponsor_str.split(",") if x.strip()
+                    ]
+                    # Re-join with commas
+                    job["sponsor"] = ", ".join(sponsor_list)
+
+                # We'll search within <div> tags with <strong> for structured data
+                additional_divs = collapse_div.find_all("div")
+                for div_item in additional_divs:
+                    strong_tag = div_item.find("strong")
+                    if strong_tag:
+                        label = strong_tag.get_text(strip=True).lower()
+                        val = div_item.get_text(separator="\n", strip=True)
+                        # remove the strong text from val
+                        val = val.replace(strong_tag.get_text(strip=True), "").strip(
+                            ": \n"
+                        )
 
-    return jobs
+                        if "degree required" in label:
+                            job["degree_required"] = val if val else "N/A"
+                        elif "job start date" in label:
+                            job["start_date"] = val if val else "N/A"
+                        elif "job duration" in label:
+                            job["duration"] = val if val else "N/A"
+                        elif "salary" in label:
+                            # unify multiple lines for salary
+                            raw_lines = val.split("\n")
+                            unified = " ".join(
+                                x.strip() for x in raw_lines if x.strip()
+                            )
+                            job["salary_range"] = unified if unified else "N/A"
+
+                # Try to parse "To Apply" link
+                apply_paragraph = collapse_div.find(
+                    "p", text=re.compile(r"To\s+Apply", re.IGNORECASE)
+                )
+                if apply_paragraph:
+                    next_link = apply_paragraph.find_next("a", href=True)
+                    if next_link:
+                        job["application_link"] = next_link.get("href", "N/A")
+                else:
+                    # or search any <a> with 'apply' in text
+                    apply_a = collapse_div.find(
+                        "a", href=True, text=re.compile(r"apply", re.IGNORECASE)
+                    )
+                    if apply_a:
+                        job["application_link"] = apply_a.get("href", "N/A")
 
+    return job
 
-df = pd.DataFrame(scrape_ejm()).head(10).to_markdown(index=False)
 
-display(Markdown(df))
+# Preview of the scraped jobs (notebook only).
+if _in_notebook():
+    preview_jobs(classify_jobs(scrape_ejm()))
 
 # %% [markdown]
 # ## CSV & Email Handling Section 📊✉️
@@ -830,6 +1378,9 @@ display(Markdown(df))
 #   - **Publication Date**
 #
 # - **How It Works:**
+#   0. **Matching Preferences:**
+#      Each subscriber only receives the jobs matching one of their preferences (all the words of "Labor Economics" in the job's title, fields, main field, program type or source); subscribers without preferences receive every job. The preferences are indexed once (`PreferenceIndex` in `search.py`), so each job is matched against all subscribers in one lookup.
+#
 #   1. **Subject Creation:**
 #      The function extracts university names from each job record. If there's only one record, it uses that university name; if multiple, it joins all unique names.
 #
@@ -840,27 +1391,59 @@ display(Markdown(df))
 #      The email is composed as a multipart message with both plain text and HTML parts.
 #
 #   4. **Sending the Email:**
-#      Using Python's `smtplib`, the function logs in to the SMTP server (defaulting to Gmail) and sends the email.
+#      The emails are queued on disk, then a few `Mailer` connections (see `mailer.py`) log in to the SMTP server (defaulting to Gmail) once each and send them at a bounded rate, retrying the failures.
 #
 #
 
 
 # %%
-def replace_none_or_empty_in_list_of_dicts(jobs):
+# Links of the EJM jobs without an application link of their own.
+EJM_HOME_URL = "https://econjobmarket.org"
+
+
+def normalize_jobs(jobs):
     """
-    Ensures all job dictionaries have consistent formatting:
+    Ensures all job dictionaries have consistent formatting, yielding each one:
     - Replace None or empty values with "N/A"
     - Strip extra whitespace
-    - Convert to lowercase for consistency
+    - Convert keys to lowercase for consistency
+    - EJM: replace 'link' with the final 'application_link' ("N/A" if missing or the
+      EJM home page) and copy a 'Flexible' start date from the previous EJM job
+
+    One pass over the stream: the EJM jobs come in page order, so the last start date
+    is all the state needed. The keys are normalized once per distinct key order.
     """
-    cleaned_jobs = []
+    layouts = {}  # Key order -> normalized keys
+    previous_start = None  # start_date of the last EJM job that has one
     for job in jobs:
-        cleaned_job = {
-            str(k).strip().lower(): str(v).strip() if v and v.strip() else "N/A"
-            for k, v in job.items()
-        }
-        cleaned_jobs.append(cleaned_job)
-    return cleaned_jobs
+        if job.get("source") == "ejm" and "application_link" in job:  # Raw EJM job
+            job.pop("temp_link", None)
+            # (1) link substitution
+            app_link = job.pop("application_link")
+            if not app_link or app_link.strip() in ("", EJM_HOME_URL):
+                job["link"] = "N/A"
+            else:
+                job["link"] = app_link
+            # (2) if 'start_date' is 'Flexible', inherit from previous
+            sd = job.get("start_date")
+            if isinstance(sd, str) and sd.lower() == "flexible":
+                job["start_date"] = previous_start or "N/A"  # "N/A" if never found
+            if job.get("start_date") and isinstance(job["start_date"], str):
+                previous_start = job["start_date"]
+
+        key_order = tuple(job)
+        keys = layouts.get(key_order)
+        if keys is None:
+            keys = layouts[key_order] = [str(k).strip().lower() for k in key_order]
+        values = [str(v).strip() if v and v.strip() else "N/A" for v in job.values()]
+        yield dict(zip(keys, values))
+
+
+def replace_none_or_empty_in_list_of_dicts(jobs):
+    """
+    List version of `normalize_jobs`.
+    """
+    return list(normalize_jobs(jobs))
 
 
 def read_existing_jobs(xml_file):
@@ -872,29 +1455,16 @@ def read_existing_jobs(xml_file):
     """
     existing_signatures = {}
 
-    if os.path.exists(xml_file):
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
+    # Streamed entry by entry, the XML tree is never held in memory
+    for job_data in iter_xml_jobs(xml_file):
+        job_signature = frozenset(
+            sorted(job_data.items())
+        )  # Sort keys to ensure consistency
 
-        for entry in root.findall("entry"):
-            job_data = {
-                child.tag.strip(): child.text.strip() if child.text else "N/A"
-                for child in entry
-            }
-            job_signature = frozenset(
-                sorted(job_data.items())
-            )  # Sort keys to ensure consistency
+        source = job_data.get("source", "Unknown")  # Extract source
 
-            source = job_data.get("source", "Unknown")  # Extract source
-
-            if source not in existing_signatures:
-                existing_signatures[source] = (
-                    set()
-                )  # Create a set for this source if it doesn’t exist
-
-            existing_signatures[source].add(
-                job_signature
-            )  # Store the signature under the correct source
+        # Store the signature under the correct source
+        existing_signatures.setdefault(source, set()).add(job_signature)
 
     print("\n🔍 Debug: Existing Job Signatures by Source from XML")
     for src, sigs in existing_signatures.items():
@@ -905,47 +1475,56 @@ def read_existing_jobs(xml_file):
 
 def append_jobs_to_xml(xml_file, jobs):
     """
-    Saves a list of job dictionaries into an XML file.
-
-    - If the file does not exist, it creates a new XML structure.
-    - If the file exists, it appends only new job entries while avoiding duplicates.
+    Saves a list of job dictionaries into the job store (`DB_FILE`) and records them
+    for the web app in the journal next to `xml_file`.
+
+    - New jobs are added and updated jobs replace their stored version, in one transaction.
+    - The new and updated jobs are appended to `JOURNAL_FILE` (one fsync per run), so
+      the cost of a run grows with the number of new jobs, not with the history.
+    - Once the journal holds `JOURNAL_COMPACT_THRESHOLD` records, it is folded back
+      into `xml_file` (the previous snapshot is kept as `previous_jobs.xml`).
     """
-    # Load existing XML or create a new root if the file doesn't exist
-    if os.path.exists(xml_file):
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-    else:
-        root = ET.Element("jobs")  # Create root element
+    with open_store(DB_FILE, xml_file, JOURNAL_FILE) as store:
+        added, updated = store.upsert_jobs(
+            # Ensure no empty values
+            {key: value if value.strip() else "N/A" for key, value in job.items()}
+            for job in jobs
+        )
 
-    # Read existing jobs to avoid duplicates
-    existing_signatures = read_existing_jobs(xml_file)
+        # Only write if something changed
+        if added or updated:
+            append_journal(
+                [("new", job) for job in added] + [("changed", job) for job in updated],
+                JOURNAL_FILE,
+            )
+            print(
+                f"✅ {len(added)} new job(s) and {len(updated)} updated job(s) "
+                f"added to {JOURNAL_FILE}"
+            )
+        else:
+            print("🔹 No new jobs found; XML file remains unchanged.")
 
-    new_entries_count = 0  # Track new records added
+        if journal_size(JOURNAL_FILE) >= JOURNAL_COMPACT_THRESHOLD:
+            compact(store, xml_file, JOURNAL_FILE)
 
-    for job in jobs:
-        # Convert job dict into a frozenset signature
-        job_str_dict = {
-            str(k).strip(): str(v).strip() for k, v in job.items() if v != "N/A"
-        }
-        job_signature = frozenset(sorted(job_str_dict.items()))
 
-        if job_signature not in existing_signatures:
-            # This is a new job! Add it to XML.
-            entry = ET.SubElement(root, "entry")
+# Stands for the subscriber's name in a rendered email, replaced for each subscriber.
+RECIPIENT_PLACEHOLDER = "\x00recipient_name\x00"
 
-            for key, value in job.items():
-                field = ET.SubElement(entry, key)
-                field.text = value if value.strip() else "N/A"  # Ensure no empty values
 
-            new_entries_count += 1
+@functools.lru_cache(maxsize=None)
+def email_environment():
+    """
+    Returns the Jinja2 environment of the email templates, created once per process.
+    The compiled templates are also cached on disk (bytecode cache in the temporary
+    directory), so that later runs skip compiling them.
+    """
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
-    # Only save if new entries were added
-    if new_entries_count > 0:
-        tree = ET.ElementTree(root)
-        tree.write(xml_file, encoding="utf-8", xml_declaration=True)
-        print(f"✅ {new_entries_count} new job(s) added to {xml_file}")
-    else:
-        print("🔹 No new jobs found; XML file remains unchanged.")
+    return Environment(
+        loader=FileSystemLoader("templates"),
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
 
 
 def send_email_new_jobs(
@@ -955,6 +1534,10 @@ def send_email_new_jobs(
     subscribers,
     smtp_server="smtp.gmail.com",
     smtp_port=587,
+    changed_jobs=None,
+    workers=MAIL_WORKERS,
+    rate=MAIL_RATE,
+    queue_file=None,
 ):
     """
     Sends personalized job update emails to each subscriber based on their preferences.
@@ -964,6 +1547,8 @@ def send_email_new_jobs(
     - Includes "Apply" buttons instead of raw links.
     - Displays the latest update timestamp.
     - Provides links to contribute or report issues on GitHub.
+    - Queues the emails on disk (`queue_file`) before sending them, so that a crashed
+      run can be resumed without losing or repeating emails (see `mailer.py`).
 
     Parameters:
         new_jobs (list): List of dictionaries containing new job data.
@@ -972,41 +1557,76 @@ def send_email_new_jobs(
         subscribers (list of dicts): List of subscriber dictionaries with 'name', 'email', and 'preferences'.
         smtp_server (str): SMTP server address (default: "smtp.gmail.com").
         smtp_port (int): SMTP server port (default: 587).
+        changed_jobs (list): Already known jobs whose details were updated (optional).
+        workers (int): Number of SMTP connections sending in parallel.
+        rate (float): Maximum number of emails sent per second (None: no limit).
+        queue_file (str): SQLite file of the email queue (default: `mail_queue.db`).
     """
+    changed_jobs = changed_jobs or []
 
     # Get the current date & time
     update_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # Load the email template using Jinja2
-    env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("email.html")
-
-    for subscriber in subscribers:
+    # Persistent email queue and SMTP workers
+    from mailer import MAIL_QUEUE_FILE, MailQueue, drain, report
+    from email.mime.text import MIMEText  # For constructing email messages
+    from email.mime.multipart import MIMEMultipart  # For handling email attachments
+    from search import PreferenceIndex  # Matches the jobs to the preferences
+
+    # Load the email template using Jinja2 (compiled once per process)
+    template = email_environment().get_template("email.html")
+    # Rendered emails by job set: subscribers receiving the same jobs share one
+    # rendering, only their name is filled in
+    rendered = {}
+
+    # Jobs relevant to each subscriber, each job being matched once against all the
+    # preferences (subscribers without preferences get every job)
+    preference_index = PreferenceIndex(subscribers)
+    routed_jobs = preference_index.route(new_jobs)
+    routed_changed = preference_index.route(changed_jobs)
+
+    # The emails of this batch are identified by the jobs they announce, so queuing
+    # the same jobs again (e.g. after a crash) does not email anyone twice.
+    batch = hashlib.blake2b(digest_size=16)
+    for job in new_jobs + changed_jobs:
+        batch.update(content_hash(job).encode())
+    batch = batch.hexdigest()
+    queue_file = queue_file or MAIL_QUEUE_FILE
+    queue = MailQueue(queue_file)
+    queued = 0
+
+    for index, subscriber in enumerate(subscribers):
         recipient_name = subscriber.get("name", "Subscriber")
         recipient_email = subscriber.get("email")
-        preferences = subscriber.get("preferences", "")
 
         if not recipient_email:
             continue  # Skip if email is missing
 
-        filtered_jobs = new_jobs  # No filter applied if preferences are empty
+        filtered_jobs = routed_jobs[index]
+        filtered_changed = routed_changed[index]
 
         # Skip sending email if no relevant jobs for this user
-        if not filtered_jobs:
+        if not filtered_jobs and not filtered_changed:
             continue
 
         # Count filtered jobs for the subject line
         num_jobs = len(filtered_jobs)
         subject = f"New Job Opportunities Found ({num_jobs})"
-
-        # Render the email with personalized details
-        html_body = template.render(
-            recipient_name=recipient_name,
-            new_jobs=filtered_jobs,
-            update_time=update_time,
-            github_repo_url=GITHUB_REPO_URL,
-            github_issue_url=GITHUB_ISSUE_URL,
-        )
+        if filtered_changed:
+            subject += f", {len(filtered_changed)} Updated"
+
+        # Render the email for this job set (once), then fill in the personal details
+        key = (tuple(map(id, filtered_jobs)), tuple(map(id, filtered_changed)))
+        if key not in rendered:
+            rendered[key] = template.render(
+                recipient_name=RECIPIENT_PLACEHOLDER,
+                new_jobs=filtered_jobs,
+                changed_jobs=filtered_changed,
+                update_time=update_time,
+                github_repo_url=GITHUB_REPO_URL,
+                github_issue_url=GITHUB_ISSUE_URL,
+            )
+        html_body = rendered[key].replace(RECIPIENT_PLACEHOLDER, recipient_name)
 
         # Create a multipart email message (plain text and HTML)
         msg = MIMEMultipart("alternative")
@@ -1015,7 +1635,7 @@ def send_email_new_jobs(
         msg["To"] = recipient_email
 
         # Plain text fallback
-        text_body = f"Hello {recipient_name},\n\nWe found {num_jobs} new research assistant or pre-doctoral positions that match your interests.\nPlease view this email in an HTML-compatible client to see the job listings with 'Apply' buttons."
+        text_body = f"Hello {recipient_name},\n\nWe found {num_jobs} new research assistant or pre-doctoral positions that match your interests ({len(filtered_changed)} known positions were updated).\nPlease view this email in an HTML-compatible client to see the job listings with 'Apply' buttons."
 
         part1 = MIMEText(text_body, "plain")
         part2 = MIMEText(html_body, "html")
@@ -1023,69 +1643,321 @@ def send_email_new_jobs(
         msg.attach(part1)
         msg.attach(part2)
 
-        # Send the email via SMTP
-        try:
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()  # Secure the connection
-                server.login(sender_email, sender_password)
-                server.send_message(msg)
-            print(f"✅ Email sent successfully to {recipient_email}!")
-        except Exception as e:
-            print(f"❌ Failed to send email to {recipient_email}: {e}")
+        queued += queue.enqueue(batch, recipient_email, msg)
+
+    # Send the queued emails (and those left over by an interrupted run) via SMTP
+    print(
+        f"📨 {queued} email(s) queued in {queue_file} "
+        f"({len(rendered)} distinct email(s) rendered)"
+    )
+    with queue:
+        mailers = drain(
+            queue,
+            smtp_server,
+            smtp_port,
+            sender_email,
+            sender_password,
+            workers=workers,
+            rate=rate,
+        )
+        report(mailers, queue)
+
+
+# Scraper of each registered source (same keys as `SOURCES`).
+SCRAPERS = {
+    "predoc": scrape_predoc,
+    "nber": scrape_nber,
+    "ejm": scrape_ejm,
+}
 
 
-def find_new_jobs():
+# Pages bigger than this are split into chunks of listing elements for parallel parsing.
+PARALLEL_CHUNK_BYTES = 150_000
+# Regex matching the start of one listing element, for the sources that can be chunked.
+CHUNK_MARKERS = {
+    "predoc": r"<article[\s>]",
+    "ejm": r"<div class=\"panel panel-info\"",
+}
+
+
+def scrape_sources(sources=None, workers=1):
     """
-    Scrapes jobs from each source, checks for duplicates using XML storage,
-    and returns a list of newly detected jobs.
+    Runs the scraper of each selected source and returns a lazy stream of the combined,
+    classified and cleaned jobs: scrape -> classify -> normalize, one job at a time.
+
+    :param sources: Names of the sources to scrape (all registered sources when None);
+        the others are reported as having no new jobs.
+    :param workers: Number of processes used to parse the pages (1 = sequential).
     """
+    if sources is None:
+        sources = list(SCRAPERS)
+
+    for name in SCRAPERS:
+        if name not in sources:
+            print(f"🔹 {name}: not scraped (unchanged or filtered out), no new jobs.")
+    names = [name for name in SCRAPERS if name in sources]
+
     # Scrape jobs from each source.
-    predoc_jobs = scrape_predoc()
-    nber_jobs = scrape_nber()
-    ejm_jobs = scrape_ejm()
+    if workers and workers > 1:
+        all_jobs = scrape_sources_parallel(names, workers)
+    else:
+        all_jobs = itertools.chain.from_iterable(SCRAPERS[name]() for name in names)
 
-    # Combine all job records into a single list.
-    all_jobs = predoc_jobs + nber_jobs + ejm_jobs
-    all_jobs = replace_none_or_empty_in_list_of_dicts(all_jobs)
+    # Chain the stages; nothing runs until the stream is consumed.
+    return normalize_jobs(classify_jobs(all_jobs))
 
-    if not all_jobs:
-        print("No jobs were scraped.")
-        return []
 
-    # Read existing job signatures from XML.
-    existing_signatures = read_existing_jobs(XML_FILE)
+def split_html_chunks(html, marker, n_chunks, start=0):
+    """
+    Splits the raw HTML (without parsing it) into at most `n_chunks` fragments, each
+    one starting at a listing element matched by the regex `marker` and holding a
+    contiguous run of them. Returns None if there is nothing worth splitting.
+    """
+    starts = [m.start() for m in re.finditer(marker, html[start:])]
+    if n_chunks < 2 or len(starts) < 2:
+        return None
+    per_chunk = -(-len(starts) // n_chunks)  # ceiling division
+    bounds = [start + pos for pos in starts[::per_chunk]] + [len(html)]
+    return [html[a:b] for a, b in zip(bounds, bounds[1:])]
 
-    print("\n🔍 Debug: Checking New Jobs Against Filtered Existing Records")
 
-    new_jobs = []
-    for job in all_jobs:
-        job_str_dict = {
-            str(k).strip().lower(): str(v).strip() if v and v.strip() else "N/A"
-            for k, v in job.items()
-        }
-        job_signature = frozenset(sorted(job_str_dict.items()))
+def read_source_chunks(name, n_chunks):
+    """
+    Returns the HTML of a big source page split into chunks of listing elements,
+    or None if the source should be parsed as a whole.
+    """
+    if name not in CHUNK_MARKERS:
+        return None
+    # EJM: the saved listing pages, one after the other
+    filenames = ejm_listing_files() if name == "ejm" else [SOURCES[name]["filename"]]
+    try:
+        html = ""
+        for filename in filenames:
+            with open(filename, "r", encoding="utf-8") as f:
+                html += f.read()
+    except Exception:
+        return None  # Let the scraper report the error.
+    if len(html) < PARALLEL_CHUNK_BYTES:
+        return None
 
-        # Use `source` to filter existing records before comparison
+    start = 0
+    if name == "predoc":
+        # Only the articles inside the opportunities container are job postings.
+        container = re.search(r"<div[^>]*class=\"[^\"]*Opportunities", html)
+        if not container:
+            return None
+        start = container.start()
+    return split_html_chunks(html, CHUNK_MARKERS[name], n_chunks, start)
+
+
+def parse_source_chunk(name, fragment):
+    """
+    Parses one chunk of listing elements of a source (runs in a worker process).
+    """
+    from bs4 import SoupStrainer
+
+    if name == "predoc":
+        soup = make_soup(fragment, SoupStrainer("article"))
+    else:
+        soup = make_soup(fragment, listing_strainer(name))
+    if name == "predoc":
+        return [parse_predoc_article(article) for article in soup.find_all("article")]
+
+    jobs = []
+    try:
+        for panel in soup.find_all("div", class_="panel panel-info"):
+            job = parse_ejm_panel(panel)
+            if job is not None:
+                jobs.append(job)
+    except Exception as e:
+        print("Error during EJM scraping:", e)
+    return jobs
+
+
+def scrape_source(name):
+    """
+    Runs the scraper of one source (runs in a worker process).
+    """
+    return list(SCRAPERS[name]())
+
+
+def scrape_sources_parallel(names, workers):
+    """
+    Parses the sources in a pool of `workers` processes. Each source is one task,
+    except the big pages, which are split into chunks of `<article>`/panel elements.
+    The merged list is in the same order as the sequential scrape.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = []
+        for name in names:
+            chunks = read_source_chunks(name, workers)
+            if chunks:
+                futures = [pool.submit(parse_source_chunk, name, c) for c in chunks]
+            else:
+                futures = [pool.submit(scrape_source, name)]
+            tasks.append(futures)
+
+        # The page-level post-processing (EJM links and start dates) is done
+        # afterwards by `normalize_jobs`, on the merged jobs in page order.
+        all_jobs = [job for futures in tasks for f in futures for job in f.result()]
+    return all_jobs
+
+
+def dedupe_jobs(jobs, store, stats=None):
+    """
+    Compares each job with the job store and yields `(status, job)` for the jobs that
+    are "new" (unknown fingerprint) or "changed" (known fingerprint, different
+    content). The jobs must already be normalized (see `normalize_jobs`).
+
+    :param store: Open `JobStore`.
+    :param stats: Optional dictionary receiving the number of jobs "seen".
+    """
+    stats = {} if stats is None else stats
+    stats["seen"] = 0
+    for job in jobs:
+        stats["seen"] += 1
         job_source = job.get("source", "Unknown")
 
-        if (
-            job_source in existing_signatures
-            and job_signature in existing_signatures[job_source]
-        ):
+        status = store.status(job)
+        if status == "unchanged":
             print(f"✅ Job Already Exists in XML ({job_source})")
+        elif status == "changed":
+            print(f"✏️ Updated Job Detected! Adding to list. ({job_source})")
+            yield status, job
         else:
             print(f"❌ New Job Detected! Adding to list. ({job_source})")
-            new_jobs.append(job)
+            yield status, job
 
-    print(f"\nFound {len(new_jobs)} new job(s).")
-    return new_jobs  # Return list of new jobs
+
+def diff_jobs(all_jobs):
+    """
+    Checks the scraped jobs (any iterable of normalized jobs) against the job store
+    and returns two lists: the new jobs and the updated ones. Only those are kept
+    in memory.
+    """
+    stats = {}
+    new_jobs, changed_jobs = [], []
+    with open_store(DB_FILE, XML_FILE, JOURNAL_FILE) as store:
+        print(f"\n🔍 Debug: Checking New Jobs Against {len(store)} Stored Jobs")
+        for status, job in dedupe_jobs(all_jobs, store, stats):
+            (new_jobs if status == "new" else changed_jobs).append(job)
+    if not stats["seen"]:
+        print("No jobs were scraped.")
+        return [], []
+
+    print(f"\nFound {len(new_jobs)} new job(s) and {len(changed_jobs)} updated job(s).")
+    return new_jobs, changed_jobs
+
+
+def find_new_jobs(sources=None, workers=1):
+    """
+    Scrapes jobs from each source, checks them against the job store, and returns
+    the list of newly detected jobs and the list of updated jobs.
+
+    :param sources: Names of the sources to scrape. By default only the sources whose
+        HTML changed since the last processed run are scraped (see `changed_sources`);
+        the others are reported as having no new jobs.
+    :param workers: Number of processes used to parse the pages (1 = sequential).
+    """
+    if sources is None:
+        sources = changed_sources()
+    return diff_jobs(scrape_sources(sources, workers))
+
+
+def write_jobs_json(json_file, jobs):
+    """
+    Saves job dictionaries to a JSON file (hand-over between CLI stages), writing them
+    one by one so that a stream of jobs is never held in memory. Returns the count.
+    """
+    count = 0
+    with open(json_file, "w", encoding="utf-8") as f:
+        f.write("[")
+        for job in jobs:
+            f.write(",\n" if count else "\n")
+            json.dump(job, f, ensure_ascii=False)
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def read_jobs_json(json_file):
+    """
+    Reads a list of job dictionaries written by `write_jobs_json`.
+    Returns an empty list if the file does not exist.
+    """
+    if not os.path.exists(json_file):
+        return []
+    with open(json_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def notify_subscribers(new_jobs, changed_jobs=None):
+    """
+    Sends the new (and updated) jobs to every subscriber of `csv_file_path`, using
+    the SMTP settings of the environment (see `smtp_settings`).
+    """
+    subscribers = read_preferences(csv_file_path)
+
+    send_email_new_jobs(
+        new_jobs, subscribers=subscribers, changed_jobs=changed_jobs, **smtp_settings()
+    )
+
+
+def smtp_settings():
+    """
+    Returns the SMTP credentials (SENDER_EMAIL, SENDER_PASSWORD) and server
+    (SMTP_SERVER, SMTP_PORT, default Gmail) of the environment. 🔒
+    Point SMTP_SERVER/SMTP_PORT to a local test server to try the emails out.
+    """
+    return {
+        "sender_email": os.getenv("SENDER_EMAIL"),
+        "sender_password": os.getenv("SENDER_PASSWORD"),
+        "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "smtp_port": int(os.getenv("SMTP_PORT", "587")),
+    }
+
+
+def send_queued_emails(workers=MAIL_WORKERS, rate=MAIL_RATE, retry_now=True):
+    """
+    Sends the emails left in the email queue by an interrupted or failed run.
+
+    :param retry_now: Send every pending email now; otherwise only the retries that
+        are due (see `mailer.MailQueue.mark_failed`).
+    """
+    from mailer import MAIL_QUEUE_FILE, MailQueue, drain, report
+
+    if not os.path.exists(MAIL_QUEUE_FILE):
+        return  # No email was ever queued
+
+    settings = smtp_settings()
+    with MailQueue(MAIL_QUEUE_FILE) as queue:
+        if retry_now:  # Asked for explicitly: don't wait for backoff
+            pending = queue.retry_now()
+        else:
+            pending = queue.counts().get("pending", 0)
+            if queue.next_retry() != 0:
+                if pending:
+                    print(f"⏳ {pending} email(s) pending, none due yet")
+                return
+        print(f"📨 {pending} email(s) pending in {MAIL_QUEUE_FILE}")
+        mailers = drain(
+            queue,
+            settings["smtp_server"],
+            settings["smtp_port"],
+            settings["sender_email"],
+            settings["sender_password"],
+            workers=workers,
+            rate=rate,
+        )
+        report(mailers, queue)
 
 
 def debug_email_with_existing_jobs(existing_jobs):
     """
     Debug function to render the email using existing jobs.
     """
-    from jinja2 import Environment, FileSystemLoader
     import datetime
 
     # Flatten jobs from all sources into a single list
@@ -1109,8 +1981,7 @@ def debug_email_with_existing_jobs(existing_jobs):
         print(job)
 
     # Load the email template using Jinja2
-    env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("email.html")
+    template = email_environment().get_template("email.html")
 
     # Get the current timestamp
     update_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -1163,41 +2034,176 @@ def debug_email_with_existing_jobs(existing_jobs):
 
 
 # %%
-def main():
+def main(sources=None, force=False, workers=PARSE_WORKERS):
     """
-    Main execution function. Calls find_new_jobs, saves new jobs to XML,
-    and optionally sends email notifications.
+    Main execution function. Downloads the sources, calls find_new_jobs, saves new
+    jobs to XML and to the Atom feeds, and optionally sends email notifications.
+
+    :param sources: Names of the sources to process (all registered sources when None).
+    :param force: Scrape the sources even if their HTML did not change since the last run.
+    :param workers: Number of processes used to parse the pages (1 = sequential).
     """
-    new_jobs = find_new_jobs()  # Call the new function
+    from dotenv import load_dotenv  # For loading environment variables
 
-    if new_jobs:
-        # Save new jobs to XML instead of CSV. 💾
-        append_jobs_to_xml(XML_FILE, new_jobs)
+    # Load environment variables from .env file
+    load_dotenv()  # For email credentials (SENDER_EMAIL, SENDER_PASSWORD)
 
-        # Retrieve SMTP credentials from environment variables. 🔒
-        sender_email = os.getenv("SENDER_EMAIL")
-        sender_password = os.getenv("SENDER_PASSWORD")
-        subscribers = read_preferences(csv_file_path)
+    fetch_sources(sources)
+    sources = list(sources or SOURCES) if force else changed_sources(sources)
+    new_jobs, changed_jobs = find_new_jobs(sources, workers)  # Call the new function
 
-        # Convert new jobs to a DataFrame for better visualization.
-        df_new = pd.DataFrame(new_jobs).head(10)
-        md_table = df_new.to_markdown(index=False)
+    if new_jobs or changed_jobs:
+        # Save new and updated jobs to the job store and XML. 💾
+        append_jobs_to_xml(XML_FILE, new_jobs + changed_jobs)
+
+        # Add them to the Atom feeds. 📰
+        update_feeds(new_jobs + changed_jobs)
 
         # Uncomment to send email notifications
-        send_email_new_jobs(new_jobs, sender_email, sender_password, subscribers)
+        notify_subscribers(new_jobs, changed_jobs)
+
+        # Display the new jobs in the notebook.
+        if _in_notebook():
+            preview_jobs(new_jobs)
 
     else:
         print("No new jobs found.")
-        if os.path.exists(XML_FILE):
-            df_new = pd.read_xml(XML_FILE).head(10)
-            md_table = df_new.to_markdown(index=False)
+        # Send the retries due from the previous runs. 📨
+        send_queued_emails(retry_now=False)
+
+    # Remember which pages were handled, so unchanged sources are skipped next time.
+    mark_sources_processed(sources)
+
+
+# %% [markdown]
+# ## Command Line Interface 🖥️
+#
+# Each stage of the workflow can run on its own, e.g. from cron or while debugging a scraper:
+#
+# | Command | What it does |
+# |---|---|
+# | `python main.py fetch` | Downloads the sources into `sources/` |
+# | `python main.py parse` | Scrapes the local HTML into `sources/parsed_jobs.json` |
+# | `python main.py diff` | Compares the parsed jobs with `jobs.xml`, saves the new ones to the XML, to the Atom feeds in `feeds/` and to `sources/new_jobs.json` |
+# | `python main.py notify` | Emails the jobs of `sources/new_jobs.json` to the subscribers |
+# | `python main.py mail` | Sends the emails left in `mail_queue.db` by an interrupted run |
+# | `python main.py run` | All of the above (default when no command is given) |
+# | `python main.py compact` | Folds `jobs.journal` back into `jobs.xml` |
+#
+# `--source predoc --source nber` restricts any command to some of the sources.
+
+
+# %%
+def build_parser():
+    """
+    Builds the argument parser of the command line interface.
+    """
+    parser = argparse.ArgumentParser(
+        description="Scrape RA and pre-doctoral job listings and notify subscribers."
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        choices=list(SOURCES),
+        dest="sources",
+        help="Only process this source (can be repeated). Default: all sources.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=PARSE_WORKERS,
+        help="Number of processes used to parse the pages (default: %(default)s).",
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("fetch", help="download the source pages")
+    commands.add_parser("parse", help=f"scrape the local pages into {PARSED_JOBS_FILE}")
+    commands.add_parser(
+        "diff",
+        help=f"save the new parsed jobs to {XML_FILE}, {FEED_DIR}/ and {NEW_JOBS_FILE}",
+    )
+    commands.add_parser("notify", help=f"email the jobs of {NEW_JOBS_FILE}")
+    commands.add_parser("mail", help="send the emails left in the email queue")
+    commands.add_parser("compact", help=f"fold {JOURNAL_FILE} back into {XML_FILE}")
+    run = commands.add_parser("run", help="fetch, parse, diff and notify")
+    run.add_argument(
+        "--force",
+        action="store_true",
+        help="scrape the sources even if they did not change since the last run",
+    )
+    return parser
+
+
+def cli(argv=None):
+    """
+    Entry point of the command line interface. Returns the process exit code.
+    """
+    args = build_parser().parse_args(argv)
+    command = args.command or "run"
+
+    if command == "fetch":
+        results = fetch_sources(args.sources)
+        for name, status in results.items():
+            print(f"{name}: {status}")
+        return 1 if "error" in results.values() else 0
+
+    if command == "parse":
+        count = write_jobs_json(
+            PARSED_JOBS_FILE, scrape_sources(args.sources, args.workers)
+        )
+        print(f"✅ {count} job(s) saved to {PARSED_JOBS_FILE}")
+        return 0
+
+    if command == "diff":
+        jobs = read_jobs_json(PARSED_JOBS_FILE)
+        if args.sources:
+            jobs = [
+                job for job in jobs if job.get("source", "").lower() in args.sources
+            ]
+        new_jobs, changed_jobs = diff_jobs(jobs)
+        if new_jobs or changed_jobs:
+            append_jobs_to_xml(XML_FILE, new_jobs + changed_jobs)
+            update_feeds(new_jobs + changed_jobs)
+        write_jobs_json(NEW_JOBS_FILE, new_jobs)
+        write_jobs_json(CHANGED_JOBS_FILE, changed_jobs)
+        return 0
+
+    if command == "notify":
+        from dotenv import load_dotenv  # For loading environment variables
+
+        load_dotenv()
+        new_jobs = read_jobs_json(NEW_JOBS_FILE)
+        changed_jobs = read_jobs_json(CHANGED_JOBS_FILE)
+        if args.sources:
+            new_jobs = [
+                job for job in new_jobs if job.get("source", "").lower() in args.sources
+            ]
+            changed_jobs = [
+                job
+                for job in changed_jobs
+                if job.get("source", "").lower() in args.sources
+            ]
+        if new_jobs or changed_jobs:
+            notify_subscribers(new_jobs, changed_jobs)
         else:
-            md_table = "No XML file found."
+            print("No new jobs to notify.")
+        return 0
+
+    if command == "mail":
+        from dotenv import load_dotenv  # For loading environment variables
+
+        load_dotenv()
+        send_queued_emails()
+        return 0
+
+    if command == "compact":
+        with open_store(DB_FILE, XML_FILE, JOURNAL_FILE) as store:
+            compact(store, XML_FILE, JOURNAL_FILE)
+        return 0
 
-    # Display the table in the notebook (either new jobs or existing XML).
-    display(Markdown(md_table))
+    main(args.sources, force=getattr(args, "force", False), workers=args.workers)
+    return 0
 
 
 # %%
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
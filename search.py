@@ -0,0 +1,327 @@
+"""
+Inverted full-text index of the jobs, used by the web app (`app.py`) to search.
+
+Every job is tokenized over its descriptive fields (`SEARCH_FIELDS`); each token points
+to the jobs containing it, with a weight depending on the field. A query is split into
+terms and each term matches the tokens starting with it, found by bisection in the
+sorted token list. A job must match every term, and results are ranked by the summed
+weights (exact token matches count double).
+
+The index is updated incrementally: `update` compares the new list of jobs with the
+indexed one and only re-indexes the rows that changed.
+
+`FacetIndex` holds one bitmap (a Python int, bit i = job i) per value of the filterable
+fields (`FACETS`) and the jobs sorted by deadline, so that combining filters is a
+bitwise AND and counting the jobs of a value is a popcount.
+
+`PreferenceIndex` works the other way round, for the emails (`main.py`): it indexes the
+subscribers' preferences, and each new job is matched once against all of them.
+"""
+
+import bisect
+import datetime
+import re
+
+from jobstore import content_hash
+
+# Field -> weight of a match in it
+SEARCH_FIELDS = {
+    "program_title": 3,
+    "fields": 2,
+    "main_field": 2,
+    "sponsor": 1,
+    "institution": 1,
+    "university": 1,
+}
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Returns the lowercase words of a text ("N/A" has none).
+    """
+    if not text or text == "N/A":
+        return []
+    return TOKEN_RE.findall(str(text).casefold())
+
+
+class SearchIndex:
+    """
+    Token -> {job id: weight} postings over the jobs' `SEARCH_FIELDS`. Job ids are
+    the positions of the jobs in the list given to `update`.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.tokens = []  # Sorted, for prefix matching
+        self.docs = []  # Per job id: (content hash, {token: weight})
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _add(self, doc_id, job):
+        weights = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for token in tokenize(job.get(field)):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                bisect.insort(self.tokens, token)
+            self.postings[token][doc_id] = weight
+        self.docs[doc_id] = (content_hash(job, derived=True), weights)
+
+    def _remove(self, doc_id):
+        for token in self.docs[doc_id][1]:
+            posting = self.postings[token]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+        self.docs[doc_id] = None
+
+    def update(self, jobs):
+        """
+        Re-indexes `jobs`, only touching the rows whose content changed since the
+        last update (new rows are added, rows past the end are dropped).
+        Returns the number of rows re-indexed.
+        """
+        jobs = list(jobs)
+        changed = 0
+        for doc_id in range(len(jobs), len(self.docs)):
+            self._remove(doc_id)
+        del self.docs[len(jobs) :]
+        for doc_id, job in enumerate(jobs):
+            if doc_id < len(self.docs):
+                if self.docs[doc_id][0] == content_hash(job, derived=True):
+                    continue
+                self._remove(doc_id)
+            else:
+                self.docs.append(None)
+            self._add(doc_id, job)
+            changed += 1
+        return changed
+
+    def _match(self, term):
+        """
+        Returns {job id: score} of the jobs with a token starting with `term`.
+        """
+        scores = {}
+        start = bisect.bisect_left(self.tokens, term)
+        for token in self.tokens[start:]:
+            if not token.startswith(term):
+                break
+            boost = 2 if token == term else 1
+            for doc_id, weight in self.postings[token].items():
+                scores[doc_id] = scores.get(doc_id, 0) + weight * boost
+        return scores
+
+    def search(self, query):
+        """
+        Returns the ids of the jobs matching every term of `query`, best first
+        (ties keep the job order). An empty query returns None.
+        """
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return None
+        scores = None
+        # Longest terms first: they usually match the fewest jobs
+        for term in terms:
+            matches = self._match(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    doc_id: score + matches[doc_id]
+                    for doc_id, score in scores.items()
+                    if doc_id in matches
+                }
+            if not scores:
+                return []
+        return sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+
+
+# Facet -> True if the field holds several comma-separated values
+FACETS = {"source": False, "program_type": False, "main_field": True}
+MONTHS = "Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec"
+# Dates found in the deadline texts: "17 Mar 2025", "March 31, 2025", "12/31/2024"
+DEADLINE_PATTERNS = [
+    (re.compile(rf"\b(\d{{1,2}}) ((?:{MONTHS})[a-z]*)\.? (\d{{4}})"), "dmy"),
+    (
+        re.compile(
+            rf"\b((?:{MONTHS})[a-z]*)\.? (\d{{1,2}})(?:st|nd|rd|th)?,? (\d{{4}})"
+        ),
+        "mdy",
+    ),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), "numeric"),
+]
+
+
+def parse_deadline(text):
+    """
+    Returns the first full date (with a year) written in a deadline text, or None
+    ("Rolling", "December 31"...).
+    """
+    found = []
+    for pattern, layout in DEADLINE_PATTERNS:
+        for match in pattern.finditer(str(text or "")):
+            if layout == "numeric":
+                month, day, year = match.groups()
+                value = f"{year}-{month}-{day}"
+                fmt = "%Y-%m-%d"
+            else:
+                groups = match.groups()
+                day, month, year = (
+                    groups if layout == "dmy" else groups[1::-1] + (groups[2],)
+                )
+                value = f"{day} {month[:3]} {year}"
+                fmt = "%d %b %Y"
+            try:
+                found.append((match.start(), datetime.datetime.strptime(value, fmt)))
+            except ValueError:
+                continue
+    return min(found)[1].date() if found else None
+
+
+def bitmap(ids):
+    """
+    Returns the bitmap of a collection of job ids.
+    """
+    if not ids:
+        return 0
+    bits = bytearray((max(ids) >> 3) + 1)
+    for doc_id in ids:
+        bits[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+def bitmap_ids(mask):
+    """
+    Returns the job ids of a bitmap, in increasing order.
+    """
+    return [i for i, bit in enumerate(bin(mask)[:1:-1]) if bit == "1"]
+
+
+class FacetIndex:
+    """
+    Per-value bitmaps of the `FACETS` fields and deadline-sorted job ids, built once
+    per list of jobs (job ids are the positions in the list).
+    """
+
+    def __init__(self, jobs=()):
+        postings = {facet: {} for facet in FACETS}
+        deadlines = []
+        count = 0
+        for doc_id, job in enumerate(jobs):
+            count += 1
+            for facet, multiple in FACETS.items():
+                value = job.get(facet) or "N/A"
+                values = value.split(",") if multiple else [value]
+                for value in values:
+                    value = value.strip()
+                    if value and value != "N/A":
+                        postings[facet].setdefault(value, []).append(doc_id)
+            deadline = parse_deadline(job.get("deadline"))
+            if deadline:
+                deadlines.append((deadline, doc_id))
+        self.all = (1 << count) - 1
+        self.values = {
+            facet: {value: bitmap(ids) for value, ids in values.items()}
+            for facet, values in postings.items()
+        }
+        deadlines.sort()
+        self.deadlines = [deadline for deadline, _ in deadlines]
+        self.deadline_ids = [doc_id for _, doc_id in deadlines]
+
+    def deadline_mask(self, start=None, end=None):
+        """
+        Returns the bitmap of the jobs with a deadline between `start` and `end`
+        (`datetime.date`, inclusive; None = unbounded), or all jobs if both are None.
+        """
+        if start is None and end is None:
+            return self.all
+        low = bisect.bisect_left(self.deadlines, start) if start else 0
+        high = bisect.bisect_right(self.deadlines, end) if end else len(self.deadlines)
+        return bitmap(self.deadline_ids[low:high])
+
+    def select(self, filters, base=None, skip=None):
+        """
+        Returns the bitmap of the jobs having every `{facet: value}` of `filters`
+        (facet `skip` excepted), within the bitmap `base` (all jobs by default).
+        """
+        mask = self.all if base is None else base
+        for facet, value in filters.items():
+            if value and facet != skip:
+                mask &= self.values.get(facet, {}).get(value, 0)
+        return mask
+
+    def counts(self, filters, base=None):
+        """
+        Returns {facet: [(value, count), ...]} of the jobs within `base`, each facet
+        counted under the filters of the other facets, largest counts first.
+        """
+        counts = {}
+        for facet, values in self.values.items():
+            mask = self.select(filters, base, skip=facet)
+            counts[facet] = sorted(
+                ((value, (bits & mask).bit_count()) for value, bits in values.items()),
+                key=lambda item: (-item[1], item[0]),
+            )
+        return counts
+
+
+# Fields of a job matched against the subscribers' preferences
+PREFERENCE_FIELDS = ("program_title", "fields", "main_field", "program_type", "source")
+
+
+class PreferenceIndex:
+    """
+    Percolator of the subscribers' preferences (e.g. "Labor Economics", "Finance",
+    "NBER"). A preference matches a job when all its words appear in the job's
+    `PREFERENCE_FIELDS`; a subscriber gets the jobs matching any of their
+    preferences, or every job if they have none.
+
+    Each preference is indexed under its longest word, so a job only checks the
+    preferences sharing one of its words: matching is linear in the number of jobs
+    and matches, not in subscribers × jobs.
+    """
+
+    def __init__(self, subscribers):
+        self.size = len(subscribers)
+        self.match_all = []  # Subscribers without preferences
+        self.anchors = {}  # Word -> [(words of the preference, subscriber index)]
+        for index, subscriber in enumerate(subscribers):
+            preferences = subscriber.get("preferences") or []
+            if isinstance(preferences, str):
+                preferences = [preferences]
+            terms = {tuple(tokenize(p)) for p in preferences} - {()}
+            if not terms:
+                self.match_all.append(index)
+            for words in terms:
+                anchor = max(words, key=len)
+                self.anchors.setdefault(anchor, []).append((frozenset(words), index))
+
+    def match(self, job):
+        """
+        Returns the set of the indices of the subscribers interested in `job`.
+        """
+        words = set()
+        for field in PREFERENCE_FIELDS:
+            words.update(tokenize(job.get(field)))
+        matched = set(self.match_all)
+        for word in words:
+            for preference, index in self.anchors.get(word, ()):
+                if index not in matched and preference <= words:
+                    matched.add(index)
+        return matched
+
+    def route(self, jobs):
+        """
+        Returns, for each subscriber (in order), the list of the `jobs` matching
+        their preferences.
+        """
+        routed = [[] for _ in range(self.size)]
+        for job in jobs:
+            for index in self.match(job):
+                routed[index].append(job)
+        return routed
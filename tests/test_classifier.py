@@ -0,0 +1,28 @@
+"""
+Tests of the keyword classifier (main.py).
+"""
+
+from main import classify_jobs, extract_main_field, extract_program_type
+
+
+def test_keywords_with_any_word_separator():
+    for separator in (" ", "-", "\xa0", "‑", "\t"):
+        title = f"Pre{separator}doc fellow"
+        assert extract_program_type(title) == "PreDoctoral Program"
+        field = f"Industrial{separator}Organization"
+        assert extract_main_field(field) == "Industrial Organization"
+
+
+def test_classify_jobs_with_non_breaking_spaces():
+    jobs = [
+        {
+            "source": "NBER",
+            "program_title": "Pre\xa0doc fellow",
+            "fields": "Industrial\xa0Organization",
+        },
+        {"source": "ejm", "fields": "Industrial\xa0Organisation"},
+    ]
+    nber, ejm = classify_jobs(jobs)
+    assert nber["program_type"] == "PreDoctoral Program"
+    assert nber["main_field"] == "Industrial Organization"
+    assert ejm["main_field"] == "Industrial Organization"
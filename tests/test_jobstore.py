@@ -0,0 +1,248 @@
+"""
+Tests of the job IDs, the content hashes and the job store (jobstore.py).
+"""
+
+import os
+
+import pytest
+
+from jobstore import (
+    JobStore,
+    append_journal,
+    compact,
+    content_hash,
+    iter_xml_jobs,
+    job_fingerprint,
+    journal_size,
+    merge_journal,
+    open_store,
+)
+
+
+def nber_job(**fields):
+    job = {
+        "source": "NBER",
+        "program_title": "Research Assistant",
+        "link": "https://example.org/ra",
+        "sponsor": "Jane Doe",
+        "fields": "Labor",
+        "deadline": "N/A",
+        "main_field": "Labor Economics",
+        "program_type": "Pre-doc",
+    }
+    job.update(fields)
+    return job
+
+
+def ejm_job(**fields):
+    job = {
+        "source": "ejm",
+        "program_title": "Predoctoral Fellow",
+        "position_id": "1234",
+        "department": "Economics",
+        "university": "Example University",
+        "deadline": "30 Jul 2025",
+    }
+    job.update(fields)
+    return job
+
+
+@pytest.fixture
+def store(tmp_path):
+    with JobStore(str(tmp_path / "jobs.db")) as store:
+        yield store
+
+
+# ---------- job_fingerprint ----------
+
+
+def test_fingerprint_ignores_formatting():
+    reformatted = nber_job(
+        program_title="  research   ASSISTANT ",
+        link="http://www.example.org/ra/",
+    )
+    assert job_fingerprint(reformatted) == job_fingerprint(nber_job())
+
+
+def test_fingerprint_ignores_html_entities():
+    escaped = nber_job(program_title="Monitoring &amp; Evaluation")
+    plain = nber_job(program_title="Monitoring & Evaluation")
+    assert job_fingerprint(escaped) == job_fingerprint(plain)
+
+
+def test_fingerprint_ignores_cosmetic_fields():
+    assert job_fingerprint(nber_job(deadline="1 Mar 2025")) == job_fingerprint(
+        nber_job()
+    )
+
+
+def test_fingerprint_tells_projects_apart():
+    assert job_fingerprint(nber_job(sponsor="John Roe")) != job_fingerprint(nber_job())
+    assert job_fingerprint(nber_job(source="Predoc")) != job_fingerprint(nber_job())
+
+
+def test_ejm_fingerprint_is_the_position_id():
+    renamed = ejm_job(program_title="Pre-doctoral Fellow", department="Econ")
+    assert job_fingerprint(renamed) == job_fingerprint(ejm_job())
+    assert job_fingerprint(ejm_job(position_id="5678")) != job_fingerprint(ejm_job())
+
+
+def test_ejm_fingerprint_without_position_id():
+    legacy = ejm_job()
+    del legacy["position_id"]
+    assert job_fingerprint(legacy) != job_fingerprint(ejm_job())
+    assert job_fingerprint(legacy) == job_fingerprint(ejm_job(position_id="N/A"))
+    assert job_fingerprint(legacy) != job_fingerprint(
+        ejm_job(position_id="N/A", university="Other University")
+    )
+
+
+# ---------- content_hash ----------
+
+
+def test_content_hash_changes_with_any_scraped_field():
+    assert content_hash(nber_job(deadline="1 Mar 2025")) != content_hash(nber_job())
+
+
+def test_content_hash_normalizes_empty_values():
+    assert content_hash(nber_job(deadline="  ")) == content_hash(nber_job())
+    assert content_hash(nber_job(deadline=None)) == content_hash(nber_job())
+
+
+def test_content_hash_ignores_html_entities():
+    escaped = nber_job(institution="Research &amp; Policy Lab")
+    plain = nber_job(institution="Research & Policy Lab")
+    assert content_hash(escaped) == content_hash(plain)
+
+
+def test_content_hash_leaves_out_classifier_output():
+    reclassified = nber_job(main_field="Macroeconomics", program_type="RA")
+    assert content_hash(reclassified) == content_hash(nber_job())
+    assert content_hash(reclassified, derived=True) != content_hash(
+        nber_job(), derived=True
+    )
+
+
+# ---------- JobStore ----------
+
+
+def test_status_and_upsert(store):
+    assert store.status(nber_job()) == "new"
+    assert store.upsert_jobs([nber_job()]) == ([nber_job()], [])
+    assert store.status(nber_job()) == "unchanged"
+    assert store.status(nber_job(main_field="Macroeconomics")) == "unchanged"
+
+    changed = nber_job(deadline="1 Mar 2025")
+    assert store.status(changed) == "changed"
+    assert store.upsert_jobs([changed]) == ([], [changed])
+    assert list(store.iter_jobs()) == [changed]
+
+
+def test_legacy_ejm_job_takes_its_position_id_quietly(store):
+    legacy = ejm_job()
+    del legacy["position_id"]
+    store.upsert_jobs([legacy])
+
+    assert store.status(ejm_job()) == "unchanged"
+    assert store.upsert_jobs([ejm_job()]) == ([], [])
+    assert job_fingerprint(ejm_job()) in store
+    assert list(store.iter_jobs()) == [ejm_job()]
+
+    # The old version (e.g. the XML imported again) is still the same job
+    assert store.status(legacy) == "unchanged"
+    assert store.upsert_jobs([legacy]) == ([], [])
+    assert list(store.iter_jobs()) == [ejm_job()]
+
+
+def test_legacy_ejm_job_updated_under_its_position_id(store):
+    legacy = ejm_job()
+    del legacy["position_id"]
+    store.upsert_jobs([legacy])
+
+    changed = ejm_job(deadline="1 Sep 2025")
+    assert store.status(changed) == "changed"
+    assert store.upsert_jobs([changed]) == ([], [changed])
+    assert len(store) == 1
+    assert job_fingerprint(changed) in store
+
+
+# ---------- Snapshot and journal ----------
+
+
+@pytest.fixture
+def files(tmp_path):
+    return {
+        "db_file": str(tmp_path / "jobs.db"),
+        "xml_file": str(tmp_path / "jobs.xml"),
+        "journal_file": str(tmp_path / "jobs.journal"),
+    }
+
+
+def write_snapshot(files, jobs):
+    with JobStore(files["db_file"] + ".export") as store:
+        store.upsert_jobs(jobs)
+        store.export_xml(files["xml_file"])
+
+
+def test_open_store_imports_the_xml_and_replays_the_journal(files):
+    write_snapshot(files, [nber_job(), ejm_job()])
+    changed = nber_job(deadline="1 Mar 2025")
+    new = nber_job(sponsor="John Roe")
+    append_journal([("changed", changed), ("new", new)], files["journal_file"])
+
+    with open_store(**files) as store:
+        assert list(store.iter_jobs()) == [changed, ejm_job(), new]
+
+
+def test_open_store_without_xml_reads_the_journal(files):
+    append_journal([("new", nber_job())], files["journal_file"])
+
+    with open_store(**files) as store:
+        assert list(store.iter_jobs()) == [nber_job()]
+
+
+def test_open_store_reimports_an_edited_xml(files):
+    write_snapshot(files, [nber_job()])
+    with open_store(**files) as store:
+        assert len(store) == 1
+
+    write_snapshot(files, [nber_job(), ejm_job()])
+    with open_store(**files) as store:
+        assert len(store) == 2
+
+
+def test_merge_journal(files):
+    changed = nber_job(deadline="1 Mar 2025")
+    new = ejm_job()
+    append_journal([("new", new), ("changed", changed)], files["journal_file"])
+
+    merged = list(merge_journal([nber_job()], files["journal_file"]))
+    assert merged == [changed, new]
+
+
+def test_merge_journal_replaces_a_legacy_ejm_job(files):
+    legacy = ejm_job()
+    del legacy["position_id"]
+    append_journal([("changed", ejm_job())], files["journal_file"])
+
+    assert list(merge_journal([legacy], files["journal_file"])) == [ejm_job()]
+
+
+def test_compact(files, tmp_path):
+    backup_file = str(tmp_path / "previous_jobs.xml")
+    write_snapshot(files, [nber_job()])
+    new = ejm_job()
+    append_journal([("new", new)], files["journal_file"])
+
+    with open_store(**files) as store:
+        compact(store, files["xml_file"], files["journal_file"], backup_file)
+        assert store.get_meta("xml_stamp") is not None
+
+    assert not os.path.exists(files["journal_file"])
+    assert journal_size(files["journal_file"]) == 0
+    assert list(iter_xml_jobs(files["xml_file"])) == [nber_job(), new]
+    assert list(iter_xml_jobs(backup_file)) == [nber_job()]
+
+    # The compacted snapshot is not imported again
+    with open_store(**files) as store:
+        assert list(store.iter_jobs()) == [nber_job(), new]
@@ -0,0 +1,127 @@
+"""
+Tests of the email queue (mailer.py): de-duplication and retry states.
+"""
+
+import smtplib
+import socket
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from mailer import MailQueue, drain, is_permanent
+
+
+def message(recipient):
+    msg = EmailMessage()
+    msg["To"] = recipient
+    msg["Subject"] = "New jobs"
+    msg.set_content("Hello")
+    return msg
+
+
+def status(queue, email_id):
+    return queue.conn.execute(
+        "SELECT status, attempts, length(message) FROM emails WHERE id = ?",
+        (email_id,),
+    ).fetchone()
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with MailQueue(str(tmp_path / "mail_queue.db")) as queue:
+        yield queue
+
+
+def test_enqueue_once_per_batch_and_recipient(queue):
+    assert queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    assert not queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    assert queue.enqueue("run-2", "a@example.org", message("a@example.org"))
+    assert queue.counts() == {"pending": 2}
+
+
+def test_sent_email_is_kept_without_its_message(queue):
+    queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    email_id, recipient, msg = queue.claim()
+    assert (recipient, msg["Subject"]) == ("a@example.org", "New jobs")
+    assert queue.claim() is None  # Already being sent
+
+    queue.mark_sent(email_id)
+    assert status(queue, email_id) == ("sent", 1, 0)
+    # Queuing the batch again does not send it twice
+    assert not queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    assert queue.claim() is None
+
+
+def test_transient_error_is_retried_later(queue):
+    queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    email_id, _, _ = queue.claim()
+
+    error = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+    assert queue.mark_failed(email_id, error, delay=60) == "pending"
+    assert queue.claim() is None  # Not due yet
+    assert 40 < queue.next_retry() <= 72
+
+    assert queue.retry_now() == 1
+    email_id, _, _ = queue.claim()
+    assert status(queue, email_id)[:2] == ("sending", 1)
+
+
+def test_permanent_error_fails_at_once(queue):
+    queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    email_id, _, _ = queue.claim()
+
+    error = smtplib.SMTPDataError(550, b"Mailbox unavailable")
+    assert queue.mark_failed(email_id, error) == "failed"
+    assert queue.counts() == {"failed": 1}
+    assert queue.next_retry() is None
+
+
+def test_refused_recipient_is_retried_on_4xx_only():
+    greylisted = smtplib.SMTPRecipientsRefused({"a@example.org": (451, b"Try later")})
+    unknown = smtplib.SMTPRecipientsRefused({"a@example.org": (550, b"No mailbox")})
+    assert not is_permanent(greylisted)
+    assert is_permanent(unknown)
+
+
+def test_gives_up_after_the_retry_window(queue):
+    queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+    email_id, _, _ = queue.claim()
+    error = ConnectionRefusedError("Connection refused")
+    assert queue.mark_failed(email_id, error, window=3600) == "pending"
+
+    # A later run, after the window
+    queue.conn.execute(
+        "UPDATE emails SET first_failure = ? WHERE id = ?",
+        (time.time() - 7200, email_id),
+    )
+    queue.retry_now()
+    email_id, _, _ = queue.claim()
+    assert queue.mark_failed(email_id, error, window=3600) == "failed"
+    assert status(queue, email_id)[:2] == ("failed", 2)
+
+
+def test_interrupted_sending_is_pending_again(tmp_path):
+    db_file = str(tmp_path / "mail_queue.db")
+    with MailQueue(db_file) as queue:
+        queue.enqueue("run-1", "a@example.org", message("a@example.org"))
+        assert queue.claim() is not None
+    with MailQueue(db_file) as queue:
+        assert queue.counts() == {"pending": 1}
+
+
+def test_drain_leaves_failed_emails_for_the_next_run(queue):
+    for recipient in ("a@example.org", "b@example.org"):
+        queue.enqueue("run-1", recipient, message(recipient))
+
+    start = time.monotonic()
+    drain(queue, "127.0.0.1", closed_port(), workers=2)
+    assert time.monotonic() - start < 10  # No waiting for the retries
+    assert queue.counts() == {"pending": 2}
+    assert queue.next_retry() > 0